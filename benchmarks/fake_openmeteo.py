@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка open-meteo для бенчмарков.
+Отвечает на /v1/forecast (одна или несколько точек через запятую, текущая
+погода и почасовой/суточный прогноз) и /v1/search
+с настраиваемой задержкой и долей ошибок. Как и open-meteo, отвечает 400
+на неизвестные переменные hourly/daily. Ответы детерминированы: погода
+вычисляется из координат, а случайность задается seed.
+
+    python benchmarks/fake_openmeteo.py --port 8765 --latency 50 --error-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeOpenMeteo:
+    """Параметры заглушки и счетчики запросов"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self):
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+        return fail
+
+
+def current_weather(lat, lon):
+    """Правдоподобная текущая погода, зависящая только от координат"""
+    h = zlib.crc32(f"{lat:.4f},{lon:.4f}".encode())
+    return {
+        'temperature': round(30 - abs(lat) * 0.6 + (h % 100) / 10, 1),
+        'windspeed': round((h >> 8) % 200 / 10, 1),
+        'winddirection': (h >> 16) % 360,
+        'weathercode': (0, 1, 2, 3, 45, 61, 71, 95)[(h >> 4) % 8],
+        'is_day': 1,
+        'time': time.strftime('%Y-%m-%dT%H:00'),
+    }
+
+
+# Переменные open-meteo, которые принимает заглушка (подмножество настоящих)
+HOURLY_VARIABLES = frozenset({
+    'temperature_2m', 'relativehumidity_2m', 'apparent_temperature', 'precipitation',
+    'weathercode', 'windspeed_10m', 'winddirection_10m', 'windgusts_10m',
+})
+DAILY_VARIABLES = frozenset({
+    'weathercode', 'temperature_2m_max', 'temperature_2m_min', 'precipitation_sum',
+    'sunrise', 'sunset', 'windspeed_10m_max',
+})
+
+
+def invalid_variable(params):
+    """Сообщение open-meteo о первой неизвестной переменной или None"""
+    for key, known in (('hourly', HOURLY_VARIABLES), ('daily', DAILY_VARIABLES)):
+        for name in params.get(key, [''])[0].split(','):
+            if name and name not in known:
+                return f"Cannot initialize WeatherVariable from invalid String value {name} for key {key}"
+    return None
+
+
+def forecast_payload(lat, lon):
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'generationtime_ms': 0.1,
+        'utc_offset_seconds': 0,
+        'timezone': 'GMT',
+        'elevation': 100.0,
+        'current_weather': current_weather(lat, lon),
+    }
+
+
+def add_forecast(payload, params):
+    """Почасовые и суточные ряды для запроса с timeformat=unixtime"""
+    days = int(params.get('forecast_days', ['1'])[0])
+    now = int(time.time())
+    start = now - now % 86400
+    current = payload['current_weather']
+    payload['hourly'] = {'time': [start + i * 3600 for i in range(days * 24)]}
+    for name in params.get('hourly', [''])[0].split(','):
+        if name:
+            payload['hourly'][name] = [round(current['temperature'] + (i % 24 - 12) / 4, 1)
+                                       if name.startswith('temperature') else current.get('weathercode', 0)
+                                       for i in range(days * 24)]
+    payload['daily'] = {'time': [start + i * 86400 for i in range(days)]}
+    for name in params.get('daily', [''])[0].split(','):
+        if name:
+            value = current.get('weathercode', 0) if name == 'weathercode' else current['temperature']
+            payload['daily'][name] = [value] * days
+    return payload
+
+
+def geocoding_payload(name):
+    h = zlib.crc32(name.casefold().encode())
+    return {'results': [{
+        'name': name,
+        'latitude': round((h % 14000) / 100 - 70, 4),
+        'longitude': round(((h >> 14) % 36000) / 100 - 180, 4),
+        'population': h % 1000000,
+    }]}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            if fake.delay():
+                self._send(503, {'error': True, 'reason': 'fake outage'})
+                return
+            if url.path == '/v1/forecast':
+                reason = invalid_variable(params)
+                if reason is not None:
+                    self._send(400, {'error': True, 'reason': reason})
+                    return
+                lats = [float(v) for v in params['latitude'][0].split(',')]
+                lons = [float(v) for v in params['longitude'][0].split(',')]
+                payloads = [forecast_payload(lat, lon) for lat, lon in zip(lats, lons)]
+                if 'hourly' in params:
+                    payloads = [add_forecast(payload, params) for payload in payloads]
+                self._send(200, payloads[0] if len(payloads) == 1 else payloads)
+            elif url.path == '/v1/search':
+                name = params.get('name', [''])[0]
+                if name.casefold().startswith('unknown'):
+                    self._send(200, {'generationtime_ms': 0.1})
+                else:
+                    self._send(200, geocoding_payload(name))
+            else:
+                self._send(404, {'error': True})
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(fake, host='127.0.0.1', port=0):
+    """Запускает заглушку в фоновом потоке; возвращает (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальная заглушка open-meteo')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, мс')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Разброс задержки, мс')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeOpenMeteo(args.latency, args.jitter, args.error_rate, args.seed)
+    server, url = start(fake, args.host, args.port)
+    print(f"WEATHER_FORECAST_URL={url}/v1/forecast")
+    print(f"WEATHER_GEOCODING_URL={url}/v1/search")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
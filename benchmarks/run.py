@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Воспроизводимые бенчмарки: запросы идут в локальную заглушку open-meteo
+(fake_openmeteo.py), кэш и индекс городов создаются во временном каталоге.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --latency 50 --error-rate 0.02 --compare results.json
+
+Сценарии:
+    main.py         — CLI в отдельном процессе, холодный (промах) и теплый (кэш) запуск
+    commands        — weather/commands.py::handle_command в этом процессе
+    interface       — путь поиска GUI (peek + fetch_weather) без окна
+    cache           — WeatherCache.get/set на 1k/10k/100k записей
+    codec           — размер записи и время encode/decode форматов кэша
+    multiprocess    — параллельная запись в один кэш из нескольких процессов
+
+Результаты — JSON с задержками (p50/p90/p99, мс), пропускной способностью
+и метаданными запуска; --compare печатает изменение p50 относительно прошлого файла.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from multiprocessing import Process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_openmeteo  # noqa: E402
+
+SCENARIOS = ('main', 'commands', 'interface', 'cache', 'codec', 'multiprocess')
+CACHE_SIZES = (1000, 10000, 100000)
+# Изменение p50, которое --compare считает регрессией
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed=None):
+    """Сводка по списку длительностей в секундах"""
+    elapsed = elapsed if elapsed is not None else sum(samples)
+    return {
+        'n': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 4),
+        'p90_ms': round(percentile(samples, 90) * 1000, 4),
+        'p99_ms': round(percentile(samples, 99) * 1000, 4),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'throughput_per_s': round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+def measure(func, args_list):
+    """Вызывает func(*args) для каждого набора аргументов и возвращает сводку"""
+    samples = []
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def city_names(prefix, count):
+    # Города, которых нет во встроенном индексе: первый запрос идет в геокодер заглушки
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+def bench_main(iterations, workdir):
+    """main.py в отдельном процессе: каждый запуск платит за старт интерпретатора"""
+    script = os.path.join(ROOT, 'main.py')
+
+    def run(*argv):
+        # Без ограничителя частоты: иначе холодный запуск замеряет его ожидание
+        subprocess.run([sys.executable, script, '--rate-limit', '0', *argv], cwd=workdir, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    cold = city_names('Maincity', iterations)
+    return {
+        'main.cold': measure(run, [('--city', city) for city in cold]),
+        'main.warm': measure(run, [('--city', cold[0])] * iterations),
+        'main.no_cache': measure(run, [('--city', cold[0], '--no-cache')] * iterations),
+    }
+
+
+def bench_commands(iterations):
+    from weather import commands
+
+    def run(city):
+        with contextlib.redirect_stdout(io.StringIO()):
+            commands.handle_command(Namespace(command='city', name=city))
+
+    cold = city_names('Commandcity', iterations)
+    coords = [(55.0 + i / 100, 37.0 + i / 100) for i in range(iterations)]
+
+    def run_coords(lat, lon):
+        with contextlib.redirect_stdout(io.StringIO()):
+            commands.handle_command(Namespace(command='coords', lat=lat, lon=lon))
+
+    return {
+        'commands.city.cold': measure(run, [(city,) for city in cold]),
+        'commands.city.warm': measure(run, [(cold[0],)] * iterations),
+        'commands.coords.cold': measure(run_coords, coords),
+        'commands.coords.warm': measure(run_coords, [coords[0]] * iterations),
+    }
+
+
+def bench_interface(iterations):
+    try:
+        import interface
+    except ImportError as e:
+        print(f"interface: пропущено ({e})", file=sys.stderr)
+        return {}
+
+    from weather.client import get_default_client
+
+    def lookup(city):
+        # То же, что show_weather и worker делают для одного города, без окна
+        cached = get_default_client().peek(('city', city))
+        if cached is None or not cached[1]:
+            interface.fetch_weather(city)
+
+    cold = city_names('Guicity', iterations)
+    results = {
+        'interface.cold': measure(lookup, [(city,) for city in cold]),
+        'interface.warm': measure(lookup, [(cold[0],)] * iterations),
+    }
+    interface.executor.shutdown(wait=False)
+    return results
+
+
+def bench_cache(workdir, sizes, operations):
+    """WeatherCache.get/set с уровнем в памяти и напрямую из SQLite"""
+    from weather.cache import WeatherCache
+
+    # Ответ целиком, как его кэширует WeatherClient
+    payload = fake_openmeteo.forecast_payload(55.75, 37.62)
+    results = {}
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.db")
+        keys = [f"city-{i}" for i in range(size)]
+        rng = random.Random(size)
+
+        populate = WeatherCache(cache_file=path, legacy_file=None, memory_capacity=0)
+        t0 = time.perf_counter()
+        populate.set_many((key, payload) for key in keys)
+        results[f"cache.{size}.populate"] = {
+            'n': size, 'total_ms': round((time.perf_counter() - t0) * 1000, 2),
+        }
+        populate.close()
+
+        for label, capacity in (('memory', size), ('storage', 0)):
+            cache = WeatherCache(cache_file=path, legacy_file=None, memory_capacity=capacity)
+            sample = [(rng.choice(keys),) for _ in range(operations)]
+            # Первый проход прогревает уровень в памяти, измеряется второй
+            for key, in sample:
+                cache.get(key)
+            results[f"cache.{size}.get.{label}"] = measure(cache.get, sample)
+            cache.close()
+
+        cache = WeatherCache(cache_file=path, legacy_file=None)
+        results[f"cache.{size}.set"] = measure(
+            cache.set, [(rng.choice(keys), payload) for _ in range(operations)])
+        cache.close()
+    return results
+
+
+def bench_codec(operations):
+    """Форматы записей кэша: байт на запись, encode и decode для текущей погоды и прогноза"""
+    from weather.codec import JSONCodec, RecordCodec, ZlibCodec
+    from weather.forecast import DAILY, FORECAST_DAYS, HOURLY, Forecast, ForecastCodec
+
+    class IndentedJSON:
+        # Формат старого weather_cache.json
+        encode = staticmethod(lambda data: json.dumps(data, ensure_ascii=False, indent=2))
+        decode = staticmethod(json.loads)
+
+    points = [(55.75 + i / 100, 37.62 + i / 100) for i in range(operations)]
+    current = [fake_openmeteo.forecast_payload(lat, lon) for lat, lon in points]
+    params = {'forecast_days': [str(FORECAST_DAYS)],
+              'hourly': [','.join(name for name, _, _ in HOURLY)],
+              'daily': [','.join(name for name, _, _ in DAILY if name != 'time')]}
+    forecasts = [
+        Forecast.from_response(fake_openmeteo.add_forecast(fake_openmeteo.forecast_payload(lat, lon), params))
+        for lat, lon in points[:max(1, operations // 10)]
+    ]
+
+    results = {}
+    for kind, items, codecs in (
+            ('current', current, (('json_indent', IndentedJSON), ('json', JSONCodec),
+                                  ('record', RecordCodec), ('record_zlib', ZlibCodec(RecordCodec, min_size=0)))),
+            ('forecast', forecasts, (('columns', ForecastCodec), ('columns_zlib', ZlibCodec(ForecastCodec))))):
+        for label, codec in codecs:
+            encoded = [codec.encode(item) for item in items]
+            name = f"codec.{kind}.{label}"
+            results[f"{name}.encode"] = measure(codec.encode, [(item,) for item in items])
+            results[f"{name}.decode"] = measure(codec.decode, [(value,) for value in encoded])
+            results[f"{name}.decode"]['bytes_per_entry'] = round(
+                statistics.fmean(len(value.encode('utf-8') if isinstance(value, str) else value)
+                                 for value in encoded), 1)
+    return results
+
+
+def _stress_writer(path, worker, writes):
+    from weather.cache import WeatherCache
+
+    cache = WeatherCache(cache_file=path, legacy_file=None)
+    for i in range(writes):
+        cache.set(f"w{worker}-{i}", {'temperature': i, 'windspeed': worker})
+    cache.close()
+
+
+def bench_multiprocess(workdir, processes, writes):
+    """Несколько процессов пишут в один файл кэша; ни одна запись не должна потеряться"""
+    from weather.cache import WeatherCache
+
+    path = os.path.join(workdir, 'stress.db')
+    WeatherCache(cache_file=path, legacy_file=None).close()
+    workers = [Process(target=_stress_writer, args=(path, n, writes)) for n in range(processes)]
+    t0 = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - t0
+
+    cache = WeatherCache(cache_file=path, legacy_file=None, memory_capacity=0)
+    lost = sum(1 for n in range(processes) for i in range(writes)
+               if cache.get(f"w{n}-{i}") is None)
+    cache.close()
+    total = processes * writes
+    return {'multiprocess.set': {
+        'n': total, 'processes': processes, 'lost': lost,
+        'total_ms': round(elapsed * 1000, 2),
+        'throughput_per_s': round(total / elapsed, 1),
+    }}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_file):
+    """Печатает изменение p50 по сценариям, общим с прошлым запуском"""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = json.load(f)['results']
+    regressions = 0
+    for name, current in results.items():
+        before = previous.get(name, {}).get('p50_ms')
+        if not before or 'p50_ms' not in current:
+            continue
+        change = current['p50_ms'] / before - 1
+        mark = ''
+        if change > REGRESSION_THRESHOLD:
+            mark = '  <-- регрессия'
+            regressions += 1
+        print(f"{name:32} {before:10.3f} -> {current['p50_ms']:10.3f} мс ({change:+.1%}){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки погодного клиента')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Сценарии через запятую: {','.join(SCENARIOS)}")
+    parser.add_argument('--iterations', type=int, default=50, help='Запросов на сценарий')
+    parser.add_argument('--cache-sizes', default=','.join(map(str, CACHE_SIZES)))
+    parser.add_argument('--cache-ops', type=int, default=10000, help='Операций get/set на размер кэша')
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help='Записей на процесс')
+    parser.add_argument('--latency', type=float, default=20.0, help='Задержка заглушки, мс')
+    parser.add_argument('--jitter', type=float, default=5.0, help='Разброс задержки, мс')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для результатов (JSON)')
+    parser.add_argument('--compare', help='Прошлый файл результатов для сравнения')
+    args = parser.parse_args()
+    scenarios = args.scenarios.split(',')
+
+    fake = fake_openmeteo.FakeOpenMeteo(args.latency, args.jitter, args.error_rate, args.seed)
+    server, url = fake_openmeteo.start(fake)
+    # До импорта weather.api: адреса читаются при импорте, в том числе в дочерних процессах
+    os.environ['WEATHER_FORECAST_URL'] = f"{url}/v1/forecast"
+    os.environ['WEATHER_GEOCODING_URL'] = f"{url}/v1/search"
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='weather-bench-') as workdir:
+        # Кэш и индекс городов по умолчанию создаются в текущем каталоге
+        os.chdir(workdir)
+        # Ограничитель частоты отключен: замеряем клиент, а не ожидание токенов.
+        # Его файл состояния — во временном каталоге, чтобы бенчмарк не расходовал
+        # общий бюджет запросов пользователя (в том числе в дочерних процессах)
+        os.environ['WEATHER_RATELIMIT_FILE'] = os.path.join(workdir, 'ratelimit.state')
+        from weather import session
+        session.configure(limiter=None)
+        for name in scenarios:
+            t0 = time.perf_counter()
+            try:
+                if name == 'main':
+                    results.update(bench_main(args.iterations, workdir))
+                elif name == 'commands':
+                    results.update(bench_commands(args.iterations))
+                elif name == 'interface':
+                    results.update(bench_interface(args.iterations))
+                elif name == 'cache':
+                    sizes = [int(size) for size in args.cache_sizes.split(',')]
+                    results.update(bench_cache(workdir, sizes, args.cache_ops))
+                elif name == 'codec':
+                    results.update(bench_codec(args.cache_ops))
+                elif name == 'multiprocess':
+                    results.update(bench_multiprocess(workdir, args.processes, args.writes))
+                else:
+                    parser.error(f"Неизвестный сценарий: {name}")
+            except (ImportError, subprocess.CalledProcessError) as e:
+                print(f"{name}: ошибка ({e})", file=sys.stderr)
+                continue
+            print(f"{name}: {time.perf_counter() - t0:.1f} с", file=sys.stderr)
+        os.chdir(ROOT)
+    server.shutdown()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'fake_server': {'latency_ms': args.latency, 'jitter_ms': args.jitter,
+                            'error_rate': args.error_rate, 'seed': args.seed,
+                            'requests': fake.requests, 'errors': fake.errors},
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Время запуска main.py при попадании в кэш.
+Кэш заполняется заранее во временном каталоге, затем main.py запускается
+с -X importtime: считается суммарное время импортов (сверх тех, что
+загружает пустой интерпретатор), самые тяжелые модули
+и время запуска сверх пустого интерпретатора (минимум и медиана).
+Бюджеты относительные: медианы сравниваются с эталоном, измеренным тут же
+вперемешку с main.py. Выход с кодом 1, если бюджет превышен или на пути
+попадания импортирован HTTP-стек.
+
+    python benchmarks/startup.py [--runs 15] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет пути попадания в кэш — во сколько раз он дольше эталона на той же
+# машине: импорты (под -X importtime) — импорта модулей REFERENCE, запуск сверх
+# `python -c pass` — самого `python -c pass`. Абсолютные миллисекунды
+# плавают с шумом машины (40-80 мс), отношение медиан — нет. Сейчас оба
+# отношения 1.0-1.5, бюджет с запасом; HTTP-стек ловит проверка FORBIDDEN,
+# а бюджет — постепенное разрастание импортов
+REFERENCE = ('json', 'sqlite3', 'argparse', 'datetime', 'decimal', 'logging', 'typing',
+             'dataclasses', 'email.message', 'zipfile')
+IMPORT_BUDGET_RATIO = 2.0
+STARTUP_BUDGET_RATIO = 2.0
+# Модули, которых не должно быть при ответе из кэша
+FORBIDDEN = ('requests', 'urllib3', 'http.client', 'http.server', 'asyncio', 'concurrent.futures')
+
+# Сколько запусков под -X importtime (main.py и эталона); берется медиана
+TRACE_RUNS = 7
+
+CITY = 'Москва'
+CACHED = {'current_weather': {'temperature': 3.2, 'windspeed': 4.0, 'winddirection': 200,
+                              'weathercode': 61, 'time': '2026-01-01T12:00'}}
+
+
+def prepare(workdir):
+    """Кладет в кэш workdir запись, которую прочитает main.py --city"""
+    sys.path.insert(0, ROOT)
+    from weather.cache import WeatherCache
+
+    cache = WeatherCache(cache_file=os.path.join(workdir, 'weather_cache.db'), legacy_file=None)
+    cache.set(cache.generate_key(city=CITY), CACHED)
+    cache.close()
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime: {модуль верхнего уровня: время с вложенными, мкс}
+    и множество всех импортированных модулей
+    """
+    top, loaded = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # заголовок
+        loaded.add(name.strip())
+        if not name.startswith('  '):
+            top[name.strip()] = int(cumulative_us)
+    return top, loaded
+
+
+def timed_run(argv, workdir):
+    started = time.perf_counter()
+    result = subprocess.run(argv, cwd=workdir, capture_output=True, text=True)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк запуска main.py при попадании в кэш')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_RATIO,
+                        help='во сколько раз импорты дольше эталона')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_RATIO,
+                        help='во сколько раз запуск дольше пустого интерпретатора')
+    parser.add_argument('--output', help='Файл для результатов (JSON)')
+    args = parser.parse_args()
+
+    script = [sys.executable, os.path.join(ROOT, 'main.py'), '--city', CITY]
+    with tempfile.TemporaryDirectory(prefix='weather-startup-') as workdir:
+        prepare(workdir)
+        # Первый запуск компилирует .pyc, его не считаем
+        timed_run(script, workdir)
+
+        # Эталон и main.py чередуются, чтобы шум машины попадал в оба
+        baseline, samples, traces, references = [], [], [], []
+        for _ in range(args.runs):
+            baseline.append(timed_run([sys.executable, '-c', 'pass'], workdir)[0])
+            samples.append(timed_run(script, workdir)[0])
+        reference = [sys.executable, '-X', 'importtime', '-c', f"import {', '.join(REFERENCE)}"]
+        for _ in range(TRACE_RUNS):
+            traces.append(timed_run([sys.executable, '-X', 'importtime', *script[1:]], workdir)[1])
+            references.append(timed_run(reference, workdir)[1])
+        _, bare = timed_run([sys.executable, '-X', 'importtime', '-c', 'pass'], workdir)
+
+    if 'из кэша' not in traces[0].stdout:
+        print(f"Запуск не попал в кэш:\n{traces[0].stdout}{traces[0].stderr}", file=sys.stderr)
+        sys.exit(1)
+
+    # Модули, которые загружает сам интерпретатор, в бюджет не входят
+    _, preloaded = parse_importtime(bare.stderr)
+    parsed = []
+    for trace in traces:
+        top, loaded = parse_importtime(trace.stderr)
+        parsed.append(({name: us for name, us in top.items() if name not in preloaded}, loaded))
+    # Медианный по сумме импортов запуск: один выброс не решает исход
+    parsed.sort(key=lambda item: sum(item[0].values()))
+    top, loaded = parsed[len(parsed) // 2]
+    import_ms = sum(top.values()) / 1000
+    reference_ms = statistics.median(
+        sum(us for name, us in parse_importtime(trace.stderr)[0].items() if name not in preloaded)
+        for trace in references) / 1000
+    startup_ms = (min(samples) - min(baseline)) * 1000
+    median_ms = (statistics.median(samples) - statistics.median(baseline)) * 1000
+    interpreter_ms = statistics.median(baseline) * 1000
+    import_ratio = import_ms / reference_ms
+    startup_ratio = median_ms / interpreter_ms
+    forbidden = [name for name in FORBIDDEN if name in loaded]
+    heaviest = sorted(top.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'interpreter_ms': round(interpreter_ms, 1),
+        'startup_ms': round(startup_ms, 1),
+        'startup_median_ms': round(median_ms, 1),
+        'startup_ratio': round(startup_ratio, 2),
+        'startup_budget_ratio': args.startup_budget,
+        'import_ms': round(import_ms, 1),
+        'reference_import_ms': round(reference_ms, 1),
+        'import_ratio': round(import_ratio, 2),
+        'import_budget_ratio': args.import_budget,
+        'heaviest_imports_ms': {name: round(us / 1000, 1) for name, us in heaviest},
+        'forbidden_imports': forbidden,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+    failures = []
+    if forbidden:
+        failures.append(f"импортированы {', '.join(forbidden)}")
+    if import_ratio > args.import_budget:
+        failures.append(f"импорты {import_ms:.1f} мс — {import_ratio:.2f} эталона > {args.import_budget}")
+    if startup_ratio > args.startup_budget:
+        failures.append(f"запуск {median_ms:.1f} мс — {startup_ratio:.2f} интерпретатора "
+                        f"> {args.startup_budget}")
+    if failures:
+        print("Бюджет превышен: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
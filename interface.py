@@ -1,43 +1,124 @@
+import queue
 import tkinter as tk
-from tkinter import messagebox
-from weather import api, cache
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
+from weather.client import get_default_client
 
-def show_weather():
-    city = city_entry.get().strip()
-    if not city:
+# Запросы к API выполняются в фоновых потоках, окно опрашивает результаты через after
+MAX_WORKERS = 4
+POLL_MS = 50
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+results = queue.Queue()
+# Номер текущего запроса: ответы на предыдущие запросы отбрасываются
+current = {'generation': 0, 'futures': []}
+
+
+def fetch_weather(city):
+    """Загружает погоду с API и сохраняет в кэш (в фоновом потоке)"""
+    return get_default_client().refresh(('city', city))
+
+
+def worker(generation, city):
+    try:
+        results.put((generation, city, fetch_weather(city), None))
+    except Exception as e:
+        results.put((generation, city, None, e))
+
+
+def set_row(city, weather=None, status=""):
+    values = (city, "", "", status)
+    if weather is not None:
+        current = weather['current_weather']
+        values = (city, f"{current['temperature']}°C", f"{current['windspeed']} м/с", status)
+    if table.exists(city):
+        table.item(city, values=values)
+    else:
+        table.insert("", "end", iid=city, values=values)
+
+
+def update_status():
+    pending = sum(1 for future in current['futures'] if not future.done())
+    status_label.config(text=f"Обновляется: {pending}" if pending else "")
+
+
+def show_weather(event=None):
+    cities = []
+    for name in city_entry.get().split(","):
+        name = name.strip()
+        if name and name not in cities:
+            cities.append(name)
+    if not cities:
         messagebox.showwarning("Ошибка", "Введите название города!")
         return
 
-    cached = cache.get_from_cache(city)
-    if cached:
-        weather = cached
-        source = " (из кэша)"
-    else:
-        try:
-            lat, lon = api.get_coords_by_city(city)
-            weather = api.get_weather_by_coords(lat, lon)
-            cache.save_to_cache(city, weather)
-            source = " (с API)"
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось получить погоду: {e}")
-            return
-
-    result_label.config(
-        text=f"Погода в {city}{source}:\nТемпература: {weather['temperature']}°C\nВетер: {weather['windspeed']} м/с"
-    )
+    # Новый запрос отменяет еще не начатые загрузки предыдущего
+    current['generation'] += 1
+    for future in current['futures']:
+        future.cancel()
+    current['futures'] = []
+    table.delete(*table.get_children())
+
+    client = get_default_client()
+    for city in cities:
+        cached = client.peek(('city', city))
+        if cached is not None:
+            weather, fresh = cached
+            if fresh:
+                set_row(city, weather, "из кэша")
+                continue
+            # Показываем устаревшие данные сразу и обновляем их в фоне
+            set_row(city, weather, "из кэша, обновляется…")
+        else:
+            set_row(city, status="загрузка…")
+        current['futures'].append(executor.submit(worker, current['generation'], city))
+    update_status()
+
+
+def poll_results():
+    try:
+        while True:
+            generation, city, weather, error = results.get_nowait()
+            if generation != current['generation'] or not table.exists(city):
+                continue
+            if error is not None:
+                set_row(city, status=f"ошибка: {error}")
+            else:
+                set_row(city, weather, "с API")
+    except queue.Empty:
+        pass
+    update_status()
+    root.after(POLL_MS, poll_results)
+
+
+def on_close():
+    executor.shutdown(wait=False, cancel_futures=True)
+    root.destroy()
+
 
 # --- Интерфейс ---
-root = tk.Tk()
-root.title("Погода (Weather CLI GUI)")
-root.geometry("350x250")
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Погода (Weather CLI GUI)")
+    root.geometry("480x320")
+
+    tk.Label(root, text="Введите город (несколько — через запятую):", font=("Arial", 12)).pack(pady=10)
+    city_entry = tk.Entry(root, width=40)
+    city_entry.pack()
+    city_entry.bind("<Return>", show_weather)
 
-tk.Label(root, text="Введите город:", font=("Arial", 12)).pack(pady=10)
-city_entry = tk.Entry(root, width=25)
-city_entry.pack()
+    tk.Button(root, text="Показать погоду", command=show_weather).pack(pady=10)
 
-tk.Button(root, text="Показать погоду", command=show_weather).pack(pady=10)
+    table = ttk.Treeview(root, columns=("city", "temperature", "wind", "status"), show="headings", height=8)
+    for column, title, width in (("city", "Город", 120), ("temperature", "Температура", 90),
+                                 ("wind", "Ветер", 80), ("status", "Источник", 160)):
+        table.heading(column, text=title)
+        table.column(column, width=width, anchor="center")
+    table.pack(fill="both", expand=True, padx=10)
 
-result_label = tk.Label(root, text="", font=("Arial", 11), justify="center")
-result_label.pack(pady=10)
+    status_label = tk.Label(root, text="", font=("Arial", 10))
+    status_label.pack(pady=5)
 
-root.mainloop()
\ No newline at end of file
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.after(POLL_MS, poll_results)
+    root.mainloop()
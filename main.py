@@ -5,126 +5,26 @@
 """
 
 import argparse
-import requests
 import json
-import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
 
-
-class WeatherAPI:
-    def __init__(self):
-        self.base_url = "https://api.open-meteo.com/v1/forecast"
-    
-    def get_weather_by_coords(self, latitude: float, longitude: float) -> dict:
-        """Получить погоду по координатам"""
-        params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'current_weather': True,
-            'timezone': 'auto',
-            'forecast_days': 1
-        }
-        
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Ошибка API: {e}")
-    
-    def get_weather_by_city(self, city_name: str) -> dict:
-        """Получить погоду по названию города (через геокодинг)"""
-        # Простой геокодинг для популярных городов
-        city_coords = {
-            'москва': (55.7558, 37.6173),
-            'санкт-петербург': (59.9343, 30.3351),
-            'новосибирск': (55.0084, 82.9357),
-            'екатеринбург': (56.8389, 60.6057),
-            'казань': (55.7961, 49.1064),
-            'нижний новгород': (56.3269, 44.0075),
-            'челябинск': (55.1644, 61.4368),
-            'самара': (53.1951, 50.1069),
-            'омск': (54.9924, 73.3686),
-            'ростов-на-дону': (47.2225, 39.7187),
-            'уфа': (54.7355, 55.9587),
-            'красноярск': (56.0153, 92.8932),
-            'пермь': (58.0105, 56.2502),
-            'воронеж': (51.6720, 39.1843),
-            'волгоград': (48.7080, 44.5133),
-            'сочи': (43.5855, 39.7231),
-            'краснодар': (45.0355, 38.9750),
-            'саратов': (51.5336, 46.0343),
-            'тюмень': (57.1530, 65.5343),
-            'иркутск': (52.2864, 104.2806)
-        }
-        
-        city_lower = city_name.lower()
-        if city_lower in city_coords:
-            latitude, longitude = city_coords[city_lower]
-            return self.get_weather_by_coords(latitude, longitude)
-        else:
-            raise Exception(f"Город '{city_name}' не найден в базе. Используйте координаты.")
-
-
-class WeatherCache:
-    def __init__(self, cache_file: str = "weather_cache.json"):
-        self.cache_file = cache_file
-        self.cache_duration = timedelta(hours=1)  # Кэшируем на 1 час
-    
-    def _load_cache(self) -> dict:
-        """Загрузить кэш из файла"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                return {}
-        return {}
-    
-    def _save_cache(self, cache: dict):
-        """Сохранить кэш в файл"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, ensure_ascii=False, indent=2)
-        except IOError as e:
-            print(f"Ошибка сохранения кэша: {e}")
-    
-    def get(self, key: str) -> dict | None:
-        """Получить данные из кэша"""
-        cache = self._load_cache()
-        
-        if key in cache:
-            cached_data = cache[key]
-            cache_time = datetime.fromisoformat(cached_data['timestamp'])
-            
-            if datetime.now() - cache_time < self.cache_duration:
-                return cached_data['data']
-            else:
-                # Удалить просроченные данные
-                del cache[key]
-                self._save_cache(cache)
-        
-        return None
-    
-    def set(self, key: str, data: dict):
-        """Сохранить данные в кэш"""
-        cache = self._load_cache()
-        
-        cache[key] = {
-            'timestamp': datetime.now().isoformat(),
-            'data': data
-        }
-        
-        self._save_cache(cache)
-    
-    def generate_key(self, latitude: float = None, longitude: float = None, city: str = None) -> str:
-        """Сгенерировать ключ для кэша"""
-        if city:
-            return f"city_{city.lower()}"
-        elif latitude is not None and longitude is not None:
-            return f"coords_{round(latitude, 2)}_{round(longitude, 2)}"
-        else:
-            raise ValueError("Должны быть указаны либо город, либо координаты")
+from weather import metrics
+from weather.address import DEFAULT_HOST, DEFAULT_PORT, parse_address
+from weather.batch import CHUNK_SIZE, parse_location, read_locations, run_batch
+from weather.cache import WeatherCache
+from weather.client import WeatherClient
+from weather.codec import ZLIB_MIN_SIZE, RecordCodec, ZlibCodec
+from weather.forecast import FORECAST_HORIZON_HOURS, forecast_at
+from weather.forecast import open_cache as open_forecast_cache
+from weather.formatting import (SOURCE_HEADERS, format_location, format_weather_data, format_weather_line,
+                                temperature_to_units)
+from weather.geocoder import import_geonames
+from weather.ratelimit import DEFAULT_RATE, RateLimiter
+from weather.session import POOL_MAXSIZE, configure
+from weather.spatial import DEFAULT_PRECISION, DEFAULT_RADIUS_KM, SpatialGrid
+from weather.warming import WARM_LEAD, WARM_RPM, WARM_TOP, Warmer
+from weather.watch import WATCH_INTERVAL, Watcher, jsonl_emitter
 
 
 def create_parser():
@@ -138,6 +38,16 @@ def create_parser():
   python main.py --coords 55.7558 37.6173
   python main.py --city Санкт-Петербург --units fahrenheit
   python main.py --city Новосибирск --no-cache
+  python main.py --city Казань --hours 3
+  python main.py --batch locations.csv > weather.jsonl
+  python main.py --batch locations.csv --concurrency 16
+  python main.py --import-geonames cities15000.txt
+  python main.py --serve 127.0.0.1:8080
+  python main.py --serve 127.0.0.1:8080 --warm-top 200
+  python main.py --warm --warm-rpm 20
+  python main.py --watch Москва 59.94,30.31 --interval 120
+  python main.py --watch Москва Казань --jsonl
+  python main.py --city Москва --stats
         '''
     )
     
@@ -154,6 +64,38 @@ def create_parser():
         metavar=('LATITUDE', 'LONGITUDE'),
         help='Координаты (например: 55.7558 37.6173)'
     )
+    group.add_argument(
+        '--batch',
+        type=str,
+        metavar='FILE',
+        help='Файл CSV/JSONL со списком городов или координат ("-" — stdin), вывод в JSONL'
+    )
+    group.add_argument(
+        '--serve',
+        type=str,
+        nargs='?',
+        const=f'{DEFAULT_HOST}:{DEFAULT_PORT}',
+        metavar='[HOST:]PORT',
+        help=f'Запустить HTTP-сервис погоды (по умолчанию: {DEFAULT_HOST}:{DEFAULT_PORT})'
+    )
+    group.add_argument(
+        '--warm',
+        action='store_true',
+        help='Прогревать кэш: обновлять популярные ключи незадолго до истечения TTL (до Ctrl+C)'
+    )
+    group.add_argument(
+        '--watch',
+        type=str,
+        nargs='+',
+        metavar='LOCATION',
+        help='Следить за погодой в точках (город или широта,долгота) и выводить только изменения (до Ctrl+C)'
+    )
+    group.add_argument(
+        '--import-geonames',
+        type=str,
+        metavar='FILE',
+        help='Собрать локальный индекс городов из дампа GeoNames (например, cities15000.txt)'
+    )
     
     parser.add_argument(
         '--units',
@@ -163,151 +105,320 @@ def create_parser():
         help='Единицы измерения температуры (по умолчанию: celsius)'
     )
     
+    parser.add_argument(
+        '--hours',
+        type=int,
+        metavar='N',
+        help=f'Прогноз на N часов вперед (0..{FORECAST_HORIZON_HOURS}); один запрос прогноза '
+             'кэшируется и отвечает на запросы о любом часе окна'
+    )
+    
     parser.add_argument(
         '--no-cache',
         action='store_true',
         help='Не использовать кэш'
     )
     
+    parser.add_argument(
+        '--compress-cache',
+        action='store_true',
+        help=f'Сжимать zlib записи кэша от {ZLIB_MIN_SIZE} байт (прогнозы, нестандартные ответы); '
+             'записи текущей погоды (~20 байт) не сжимаются'
+    )
+    
+    parser.add_argument(
+        '--grid-precision',
+        type=int,
+        choices=range(1, 13),
+        metavar='N',
+        default=DEFAULT_PRECISION,
+        help=f'Точность geohash для ключей кэша по координатам (по умолчанию: {DEFAULT_PRECISION}, ячейка ~1 км)'
+    )
+    
+    parser.add_argument(
+        '--grid-radius',
+        type=float,
+        default=DEFAULT_RADIUS_KM,
+        help=f'В каком радиусе, км, брать из кэша данные соседней ячейки (по умолчанию: {DEFAULT_RADIUS_KM}, 0 — не брать)'
+    )
+    
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=CHUNK_SIZE,
+        help=f'Сколько точек запрашивать у API за один запрос (по умолчанию: {CHUNK_SIZE})'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='Сколько запросов к API выполнять параллельно в пакетном режиме (по умолчанию: 1)'
+    )
+    
+    parser.add_argument(
+        '--warm-top',
+        type=int,
+        metavar='N',
+        help=f'Сколько самых популярных ключей прогревать (по умолчанию: {WARM_TOP}); '
+             'с --serve включает прогрев в фоне'
+    )
+    
+    parser.add_argument(
+        '--warm-rpm',
+        type=float,
+        default=WARM_RPM,
+        help=f'Не больше стольких запросов прогрева к API в минуту (по умолчанию: {WARM_RPM})'
+    )
+    
+    parser.add_argument(
+        '--warm-lead',
+        type=float,
+        default=WARM_LEAD / 60,
+        metavar='MINUTES',
+        help=f'За сколько минут до истечения TTL обновлять ключ (по умолчанию: {WARM_LEAD // 60})'
+    )
+    
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='С --warm: один проход прогрева и выход (например, из cron)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=WATCH_INTERVAL,
+        metavar='SECONDS',
+        help=f'С --watch: как часто проверять обновления (по умолчанию: {WATCH_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '--jsonl',
+        action='store_true',
+        help='С --watch: выводить изменения в JSONL вместо строк для терминала'
+    )
+    
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=DEFAULT_RATE,
+        metavar='RPS',
+        help=f'Не больше стольких запросов к API в секунду на все запущенные процессы '
+             f'(по умолчанию: {DEFAULT_RATE:g}, 0 — без ограничения); пакетный режим '
+             'и прогрев уступают интерактивным запросам'
+    )
+    
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='При выходе вывести в stderr сводку метрик в JSON: время участков, попадания в кэш, ответы API'
+    )
+    
     return parser
 
 
-def temperature_to_units(temperature: float, units: str) -> float:
-    """Конвертировать температуру в нужные единицы"""
-    if units == 'fahrenheit':
-        return (temperature * 9/5) + 32
-    return temperature
+def run_batch_file(args, client: WeatherClient):
+    """Пакетный режим: результаты в stdout в формате JSONL, итог в stderr"""
+    if args.batch == '-':
+        locations = read_locations(sys.stdin)
+    else:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            locations = read_locations(f)
+    
+    stats = run_batch(
+        locations, client,
+        cache=None if args.no_cache else client.cache,
+        key_func=client.location_key,
+        out=sys.stdout,
+        chunk_size=args.batch_size,
+        concurrency=args.concurrency
+    )
+    print(
+        f"Готово: {len(locations)} точек, из кэша {stats['cache']}, "
+        f"с API {stats['api']}, ошибок {stats['errors']}",
+        file=sys.stderr
+    )
+
+
+def run_watch(args, client: WeatherClient):
+    """Режим наблюдения: изменения в stdout строками или JSONL, до Ctrl+C"""
+    if args.jsonl:
+        emit = jsonl_emitter(sys.stdout)
+    else:
+        def emit(location, source=None, data=None, error=None):
+            if error is not None:
+                print(f"{format_location(location)}: {error}", file=sys.stderr)
+            else:
+                print(format_weather_line(location, data, args.units), flush=True)
+    
+    watcher = Watcher(
+        args.watch, client,
+        cache=None if args.no_cache else client.cache,
+        key_func=client.location_key,
+        emit=emit,
+        interval=args.interval,
+        chunk_size=args.batch_size
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("\nНаблюдение остановлено", file=sys.stderr)
 
 
-def get_wind_direction(degree: float) -> str:
-    """Определить направление ветра по градусам"""
-    directions = ['С', 'СВ', 'В', 'ЮВ', 'Ю', 'ЮЗ', 'З', 'СЗ']
-    index = round(degree / 45) % 8
-    return directions[index]
+def create_warmer(args, client: WeatherClient) -> Warmer:
+    """Прогреватель кэша с настройками из аргументов командной строки"""
+    return Warmer(
+        client.cache, client,
+        top=args.warm_top or WARM_TOP,
+        rpm=args.warm_rpm,
+        lead=args.warm_lead * 60,
+        chunk_size=args.batch_size
+    )
 
 
-def format_weather_data(weather_data: dict, units: str = 'celsius') -> str:
-    """Отформатировать данные о погоде для вывода"""
-    current = weather_data.get('current_weather', {})
-    
-    temperature = current.get('temperature', 0)
-    wind_speed = current.get('windspeed', 0)
-    wind_direction = current.get('winddirection', 0)
-    weather_code = current.get('weathercode', 0)
-    time = current.get('time', '')
+def run_warmer(args, client: WeatherClient):
+    """Режим прогрева: один проход с --once, иначе до Ctrl+C"""
+    warmer = create_warmer(args, client)
+    if args.once:
+        stats = warmer.run_once()
+        print(
+            f"Прогрето ключей: {stats['refreshed']}, запросов к API: {stats['requests']}, "
+            f"ошибок: {stats['errors']}",
+            file=sys.stderr
+        )
+        return
     
-    # Конвертируем температуру
-    temp_value = temperature_to_units(temperature, units)
-    temp_unit = '°C' if units == 'celsius' else '°F'
-    
-    # Описание погоды по коду
-    weather_descriptions = {
-        0: 'Ясно',
-        1: 'Преимущественно ясно',
-        2: 'Переменная облачность',
-        3: 'Пасмурно',
-        45: 'Туман',
-        48: 'Туман с инеем',
-        51: 'Лежащая морось',
-        53: 'Морось',
-        55: 'Сильная морось',
-        56: 'Ледяная морось',
-        57: 'Сильная ледяная морось',
-        61: 'Небольшой дождь',
-        63: 'Умеренный дождь',
-        65: 'Сильный дождь',
-        66: 'Ледяной дождь',
-        67: 'Сильный ледяной дождь',
-        71: 'Небольшой снег',
-        73: 'Умеренный снег',
-        75: 'Сильный снег',
-        77: 'Снежные зерна',
-        80: 'Небольшой ливень',
-        81: 'Умеренный ливень',
-        82: 'Сильный ливень',
-        85: 'Небольшой снегопад',
-        86: 'Сильный снегопад',
-        95: 'Гроза',
-        96: 'Гроза с градом',
-        99: 'Сильная гроза с градом'
-    }
-    
-    weather_desc = weather_descriptions.get(weather_code, 'Неизвестно')
-    wind_dir = get_wind_direction(wind_direction)
-    
-    # Форматируем время
-    if time:
-        try:
-            dt = datetime.fromisoformat(time.replace('Z', '+00:00'))
-            formatted_time = dt.strftime("%d.%m.%Y %H:%M")
-        except:
-            formatted_time = time
+    print(f"Прогрев кэша: top {warmer.top}, не больше {args.warm_rpm:g} запросов в минуту", file=sys.stderr)
+    try:
+        warmer.run()
+    except KeyboardInterrupt:
+        print("\nПрогрев остановлен", file=sys.stderr)
+
+
+def show_forecast(args, client: WeatherClient):
+    """Режим прогноза: погода через args.hours часов из кэша прогнозов"""
+    if args.city:
+        cache_key = client.location_key(('city', args.city))
+        fetch = lambda: client.get_forecast_by_coords(*client.get_coords_by_city(args.city))
     else:
-        formatted_time = "Неизвестно"
+        lat, lon = args.coords
+        cache_key = client.location_key(('coords', lat, lon))
+        fetch = lambda: client.get_forecast_by_coords(lat, lon)
     
-    result = [
-        "┌──────────────────────────────┐",
-        "│           ПОГОДА             │",
-        "├──────────────────────────────┤",
-        f"│ Температура: {temp_value:5.1f} {temp_unit:3} │",
-        f"│ Погода: {weather_desc:19} │",
-        f"│ Ветер: {wind_speed:3.1f} м/с, {wind_dir:2}     │",
-        f"│ Время: {formatted_time:19} │",
-        "└──────────────────────────────┘"
-    ]
+    when = datetime.now().timestamp() + args.hours * 3600
+    if args.no_cache:
+        forecast = fetch()
+        point, day, source = forecast.at(when), forecast.day(when), 'api'
+    else:
+        forecast_cache = open_forecast_cache(compress=args.compress_cache, spatial=client.cache.spatial)
+        try:
+            point, day, source = forecast_at(forecast_cache, cache_key, fetch, when)
+        finally:
+            forecast_cache.close()
     
-    return '\n'.join(result)
+    print(SOURCE_HEADERS[source])
+    print(f"Прогноз через {args.hours} ч:")
+    # Пропуски в рядах прогноза заменяются значениями по умолчанию форматтера
+    current = {field: value for field, value in point.items() if value is not None}
+    print(format_weather_data({'current_weather': current}, args.units))
+    if day is not None and None not in (day['temperature_min'], day['temperature_max']):
+        low = temperature_to_units(day['temperature_min'], args.units)
+        high = temperature_to_units(day['temperature_max'], args.units)
+        print(f"За {day['date']}: от {low:.1f} до {high:.1f}, осадки {day['precipitation'] or 0:.1f} мм")
 
 
 def main():
     """Основная функция приложения"""
     parser = create_parser()
     args = parser.parse_args()
+    if args.warm_rpm <= 0:
+        parser.error("--warm-rpm должно быть больше нуля")
+    if args.hours is not None and not 0 <= args.hours <= FORECAST_HORIZON_HOURS:
+        parser.error(f"--hours должно быть от 0 до {FORECAST_HORIZON_HOURS}")
+    
+    if args.interval <= 0:
+        parser.error("--interval должно быть больше нуля")
+    if args.batch_size < 1:
+        parser.error("--batch-size должно быть больше нуля")
+    if args.watch:
+        try:
+            args.watch = list(dict.fromkeys(parse_location(text) for text in args.watch))
+        except (ValueError, TypeError) as e:
+            parser.error(f"--watch: не удалось разобрать точку ({e})")
+        if None in args.watch:
+            parser.error("--watch: ожидается город или широта,долгота")
+    if args.rate_limit < 0:
+        parser.error("--rate-limit не может быть отрицательным")
+    
+    http_options = {}
+    if args.concurrency > POOL_MAXSIZE:
+        # Соединений в пуле должно хватать на все параллельные запросы
+        http_options['pool_maxsize'] = args.concurrency
+    if args.rate_limit != DEFAULT_RATE:
+        http_options['limiter'] = RateLimiter(args.rate_limit) if args.rate_limit else None
+    if http_options:
+        configure(**http_options)
     
-    api = WeatherAPI()
-    cache = WeatherCache()
+    cache = WeatherCache(spatial=SpatialGrid(args.grid_precision, args.grid_radius),
+                         codec=ZlibCodec() if args.compress_cache else RecordCodec)
+    client = WeatherClient(cache=cache)
+    metrics.register('cache', cache.stats)
     
     try:
-        # Генерируем ключ для кэша
-        if args.city:
-            cache_key = cache.generate_key(city=args.city)
-            # Проверяем кэш, если не отключен
-            if not args.no_cache:
-                cached_data = cache.get(cache_key)
-                if cached_data:
-                    print("📁 Данные из кэша:")
-                    print(format_weather_data(cached_data, args.units))
-                    return
-            
-            # Получаем данные из API
-            weather_data = api.get_weather_by_city(args.city)
-            # Сохраняем в кэш
-            if not args.no_cache:
-                cache.set(cache_key, weather_data)
-            
-        else:  # coordinates
-            lat, lon = args.coords
-            cache_key = cache.generate_key(latitude=lat, longitude=lon)
-            
-            # Проверяем кэш, если не отключен
-            if not args.no_cache:
-                cached_data = cache.get(cache_key)
-                if cached_data:
-                    print("📁 Данные из кэша:")
-                    print(format_weather_data(cached_data, args.units))
-                    return
+        if args.batch:
+            run_batch_file(args, client)
+            return
+        
+        if args.serve:
+            from weather.server import WeatherService, serve
             
-            # Получаем данные из API
-            weather_data = api.get_weather_by_coords(lat, lon)
-            # Сохраняем в кэш
-            if not args.no_cache:
-                cache.set(cache_key, weather_data)
+            host, port = parse_address(args.serve)
+            warmer = create_warmer(args, client) if args.warm_top else None
+            if warmer is not None:
+                warmer.start()
+            try:
+                serve(WeatherService(client, args.batch_size), host, port)
+            finally:
+                if warmer is not None:
+                    warmer.stop()
+            return
+        
+        if args.warm:
+            run_warmer(args, client)
+            return
+        
+        if args.watch:
+            run_watch(args, client)
+            return
+        
+        if args.import_geonames:
+            count = import_geonames(args.import_geonames)
+            print(f"Индекс городов собран: {count} названий")
+            return
+        
+        if args.hours is not None:
+            show_forecast(args, client)
+            return
+        
+        location = ('city', args.city) if args.city else ('coords', *args.coords)
+        if args.no_cache:
+            weather_data, source = client.fetch(location), 'api'
+        else:
+            # Устаревшие данные показываются сразу и обновляются в фоне,
+            # одновременные запросы одного ключа идут в API один раз
+            weather_data, source = client.lookup(location)
         
-        print("🌤️  Данные из API:")
+        print(SOURCE_HEADERS[source])
         print(format_weather_data(weather_data, args.units))
         
     except Exception as e:
         print(f"❌ Ошибка: {e}")
+    finally:
+        client.close()
+        if args.stats:
+            # В stderr, чтобы не смешивать с JSONL пакетного режима
+            print(json.dumps(metrics.summary(), ensure_ascii=False, indent=2), file=sys.stderr)
 
 
 if __name__ == "__main__":
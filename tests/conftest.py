@@ -0,0 +1,91 @@
+"""
+Общие фикстуры регрессионных тестов: локальная заглушка open-meteo
+(benchmarks/fake_openmeteo.py) и временный рабочий каталог, в котором
+CLI создают кэш, индекс городов и файлы состояния ограничителя и выключателя.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fake_openmeteo  # noqa: E402
+
+from weather.backend import OpenMeteoBackend  # noqa: E402
+from weather.cache import WeatherCache  # noqa: E402
+from weather.client import WeatherClient  # noqa: E402
+from weather.geocoder import GeoIndex  # noqa: E402
+
+
+@pytest.fixture
+def fake_api():
+    """Заглушка open-meteo; fake.url — ее адрес, error_rate можно менять по ходу теста"""
+    fake = fake_openmeteo.FakeOpenMeteo()
+    server, fake.url = fake_openmeteo.start(fake)
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Файлы состояния (locking.state_file) — во временном каталоге, а не в каталоге пользователя"""
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    return tmp_path / 'weather'
+
+
+@pytest.fixture
+def make_client(fake_api, tmp_path, state_dir):
+    """
+    Фабрика WeatherClient поверх заглушки: кэш и индекс городов в tmp_path,
+    без ограничителя частоты и повторов; breakers включает выключатель
+    """
+    from weather.session import HTTPClient
+
+    clients = []
+
+    def make(breakers=False, **cache_options):
+        http = HTTPClient(max_retries=0, limiter=None, breakers=breakers)
+        backend = OpenMeteoBackend(http, forecast_url=f"{fake_api.url}/v1/forecast",
+                                   geocoding_url=f"{fake_api.url}/v1/search")
+        cache = WeatherCache(cache_file=str(tmp_path / 'weather_cache.db'), legacy_file=None,
+                             **cache_options)
+        client = WeatherClient(backend, cache, GeoIndex(str(tmp_path / 'geocode.idx')))
+        clients.append((client, http))
+        return client
+
+    yield make
+    for client, http in clients:
+        client.close()
+        http.close()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
+
+
+@pytest.fixture
+def run_cli(fake_api, tmp_path):
+    """
+    Запускает CLI в отдельном процессе с рабочим каталогом tmp_path:
+    run_cli('main.py', '--city', 'Москва') или run_cli('-m', 'weather.main', 'city', 'Москва')
+    """
+    env = dict(os.environ,
+               WEATHER_FORECAST_URL=f"{fake_api.url}/v1/forecast",
+               WEATHER_GEOCODING_URL=f"{fake_api.url}/v1/search",
+               XDG_RUNTIME_DIR=str(tmp_path),
+               PYTHONPATH=ROOT)
+
+    def run(*argv, stdin=None):
+        if argv[0] == 'main.py':
+            argv = (os.path.join(ROOT, 'main.py'), *argv[1:])
+        return subprocess.run([sys.executable, *argv], cwd=tmp_path, env=env, input=stdin,
+                              capture_output=True, text=True, timeout=60)
+
+    return run
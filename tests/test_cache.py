@@ -0,0 +1,61 @@
+"""WeatherCache поверх SQLite: очистка просроченных записей, межпроцессные блокировки"""
+
+import sqlite3
+import threading
+import time
+
+from weather.cache import WeatherCache
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return [key for key, in conn.execute('SELECT key FROM cache ORDER BY key')]
+
+
+def test_one_shot_writes_purge_expired(tmp_path):
+    path = str(tmp_path / 'weather_cache.db')
+    # Каждый запуск CLI пишет одну-две записи и завершается
+    for n in range(20):
+        cache = WeatherCache(cache_file=path, legacy_file=None, ttl_hours=0, stale_hours=0)
+        if n % 2:
+            cache.set(f"k{n}", {'n': n})
+        else:
+            cache.set_many([(f"k{n}", {'n': n})])
+        cache.set_missing(f"m{n}", 'не найден')
+        cache.close()
+    assert len(rows(path)) <= 2
+
+
+def test_expired_kept_without_writes(tmp_path):
+    path = str(tmp_path / 'weather_cache.db')
+    cache = WeatherCache(cache_file=path, legacy_file=None, ttl_hours=0, stale_hours=0)
+    cache.set('k', {'n': 1})
+    cache.close()
+
+    # Без новых записей (API недоступен) просроченные данные остаются для last_known
+    cache = WeatherCache(cache_file=path, legacy_file=None, ttl_hours=0, stale_hours=0)
+    assert cache.get('k') is None
+    assert cache.last_known('k') == {'n': 1}
+    cache.close()
+
+
+def test_process_locks_are_per_key(tmp_path):
+    path = str(tmp_path / 'weather_cache.db')
+    # Отдельные экземпляры — отдельные файловые дескрипторы, как у разных процессов
+    caches = [WeatherCache(cache_file=path, legacy_file=None) for _ in range(2)]
+
+    def slow_fetch():
+        time.sleep(0.5)
+        return {'n': 1}
+
+    threads = [threading.Thread(target=cache.get_or_fetch, args=(key, slow_fetch))
+               for cache, key in zip(caches, ('a', 'b'))]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Загрузки разных ключей не ждут друг друга
+    assert time.monotonic() - start < 0.9
+    for cache in caches:
+        cache.close()
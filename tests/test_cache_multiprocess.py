@@ -0,0 +1,65 @@
+"""Несколько процессов одновременно пишут и читают один файл кэша"""
+
+import os
+from multiprocessing import Process
+
+from weather.cache import WeatherCache
+
+PROCESSES = 8
+WRITES = 100
+SHARED_KEYS = 20
+
+
+def payload(writer, i):
+    return {'utc_offset_seconds': 0,
+            'current_weather': {'temperature': round(writer + i / 10, 1), 'weathercode': i % 100}}
+
+
+def worker(path, fetch_log, writer):
+    cache = WeatherCache(cache_file=path, legacy_file=None)
+    for i in range(WRITES):
+        if i % 2:
+            cache.set(f"w{writer}-{i}", payload(writer, i))
+        else:
+            cache.set_many([(f"w{writer}-{i}", payload(writer, i))])
+        # Записи других процессов видны целиком или не видны вовсе
+        other = (writer + 1) % PROCESSES
+        data = cache.get(f"w{other}-{i}")
+        if data is not None and data != payload(other, i):
+            raise AssertionError(f"Поврежденная запись w{other}-{i}: {data}")
+
+    def fetch(key):
+        with open(fetch_log, 'a', encoding='utf-8') as f:
+            f.write(key + '\n')
+        return payload(-1, int(key.split('-')[1]))
+
+    # Общие ключи: промах загружается одним процессом, остальные читают его запись
+    for k in range(SHARED_KEYS):
+        key = f"shared-{k}"
+        data, _ = cache.get_or_fetch(key, lambda: fetch(key))
+        if data != payload(-1, k):
+            raise AssertionError(f"Поврежденная запись {key}: {data}")
+    cache.close()
+
+
+def test_concurrent_processes(tmp_path):
+    path = str(tmp_path / 'weather_cache.db')
+    fetch_log = str(tmp_path / 'fetches.log')
+    workers = [Process(target=worker, args=(path, fetch_log, n)) for n in range(PROCESSES)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(120)
+    assert [process.exitcode for process in workers] == [0] * PROCESSES
+
+    cache = WeatherCache(cache_file=path, legacy_file=None, memory_capacity=0)
+    lost = [(n, i) for n in range(PROCESSES) for i in range(WRITES)
+            if cache.get(f"w{n}-{i}") != payload(n, i)]
+    cache.close()
+    assert lost == []
+
+    with open(fetch_log, encoding='utf-8') as f:
+        fetched = f.read().split()
+    # Файловые блокировки: каждый общий ключ загружен ровно один раз
+    assert sorted(fetched) == sorted(f"shared-{k}" for k in range(SHARED_KEYS))
+    assert os.path.exists(path + '.locks')
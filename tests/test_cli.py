@@ -0,0 +1,100 @@
+"""main.py и python -m weather.main против заглушки open-meteo"""
+
+import json
+
+import fake_openmeteo
+from weather.formatting import SOURCE_HEADERS
+
+MOSCOW = (55.7558, 37.6173)
+
+
+def temperature(lat, lon):
+    return fake_openmeteo.current_weather(lat, lon)['temperature']
+
+
+def read_jsonl(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def by_query(records):
+    """Записи пакетного режима по запросу: порядок вывода — по готовности"""
+    return {json.dumps(record['query'], ensure_ascii=False): record for record in records}
+
+
+def test_main_city_then_cache(run_cli, fake_api):
+    first = run_cli('main.py', '--city', 'Москва')
+    assert first.returncode == 0, first.stderr
+    assert first.stdout.startswith(SOURCE_HEADERS['api'])
+    assert f"{temperature(*MOSCOW):5.1f} °C" in first.stdout
+    requests = fake_api.requests
+
+    second = run_cli('main.py', '--city', 'москва')
+    assert second.stdout.startswith(SOURCE_HEADERS['cache'])
+    assert second.stdout.splitlines()[1:] == first.stdout.splitlines()[1:]
+    assert fake_api.requests == requests
+
+
+def test_main_coords_and_no_cache(run_cli, fake_api):
+    result = run_cli('main.py', '--coords', '10', '20')
+    assert result.stdout.startswith(SOURCE_HEADERS['api'])
+    assert f"{temperature(10.0, 20.0):5.1f} °C" in result.stdout
+
+    requests = fake_api.requests
+    result = run_cli('main.py', '--coords', '10', '20', '--no-cache')
+    assert result.stdout.startswith(SOURCE_HEADERS['api'])
+    assert fake_api.requests == requests + 1
+
+
+def test_main_city_not_found(run_cli):
+    result = run_cli('main.py', '--city', 'Unknownville')
+    assert "❌ Ошибка: Город 'Unknownville' не найден" in result.stdout
+
+
+def test_main_api_error(run_cli, fake_api):
+    fake_api.error_rate = 1.0
+    result = run_cli('main.py', '--coords', '10', '20')
+    assert result.stdout.startswith("❌ Ошибка: Ошибка API")
+    # Первая попытка и MAX_RETRIES повторов
+    assert fake_api.requests == 4
+
+
+def test_main_batch(run_cli, tmp_path):
+    (tmp_path / 'points.csv').write_text('city\nМосква\n10,20\nUnknownia\n', encoding='utf-8')
+    result = run_cli('main.py', '--batch', 'points.csv')
+    assert result.returncode == 0, result.stderr
+    records = by_query(read_jsonl(result.stdout))
+    moscow, point = records['{"city": "Москва"}'], records['{"lat": 10.0, "lon": 20.0}']
+    assert moscow['source'] == point['source'] == 'api'
+    assert moscow['data']['current_weather']['temperature'] == temperature(*MOSCOW)
+    assert 'не найден' in records['{"city": "Unknownia"}']['error']
+    assert 'ошибок 1' in result.stderr
+
+    # Повтор из stdin: все найденное — из кэша в той же схеме данных
+    again = read_jsonl(run_cli('main.py', '--batch', '-', stdin='Москва\n10,20\n').stdout)
+    assert [record['source'] for record in again] == ['cache', 'cache']
+    assert [record['data'] for record in again] == [moscow['data'], point['data']]
+
+
+def test_weather_main_commands(run_cli, fake_api, tmp_path):
+    result = run_cli('-m', 'weather.main', 'city', 'Москва')
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith('[') and f"Москва: {temperature(*MOSCOW):.1f} °C" in result.stdout
+
+    result = run_cli('-m', 'weather.main', 'coords', '10', '20')
+    assert '10.0, 20.0:' in result.stdout
+
+    # Кэш общий с main.py
+    requests = fake_api.requests
+    result = run_cli('main.py', '--city', 'Москва')
+    assert result.stdout.startswith(SOURCE_HEADERS['cache'])
+    assert fake_api.requests == requests
+
+    result = run_cli('-m', 'weather.main', 'city', 'Unknownx')
+    assert "Город 'Unknownx' не найден" in result.stdout
+
+    (tmp_path / 'points.jsonl').write_text('{"city": "Москва"}\n{"lat": 1, "lon": 2}\n', encoding='utf-8')
+    result = run_cli('-m', 'weather.main', 'batch', 'points.jsonl', '--chunk-size', '1')
+    records = by_query(read_jsonl(result.stdout))
+    assert records['{"city": "Москва"}']['source'] == 'cache'
+    assert records['{"lat": 1.0, "lon": 2.0}']['source'] == 'api'
+    assert records['{"lat": 1.0, "lon": 2.0}']['data']['current_weather']['temperature'] == temperature(1.0, 2.0)
@@ -0,0 +1,73 @@
+"""WeatherClient поверх OpenMeteoBackend и заглушки: кэш, ненайденные города, сбои API"""
+
+import pytest
+
+import fake_openmeteo
+from weather.breaker import FAILURE_THRESHOLD, CircuitOpenError
+
+
+def test_lookup_api_then_cache(client, fake_api):
+    data, source = client.lookup(('coords', 10.0, 20.0))
+    assert source == 'api'
+    assert data['current_weather']['temperature'] == fake_openmeteo.current_weather(10.0, 20.0)['temperature']
+
+    cached, source = client.lookup(('coords', 10.0, 20.0))
+    assert source == 'cache'
+    # Ответ API и запись из кэша — в одной схеме
+    assert cached == data
+    assert 'latitude' not in data and 'is_day' not in data['current_weather']
+    assert fake_api.requests == 1
+
+
+def test_lookup_city_learns_coordinates(client, fake_api):
+    data, source = client.lookup(('city', 'Gotham'))
+    assert source == 'api'
+    assert client.geocoder.lookup('gotham') is not None
+    assert client.lookup(('city', 'Gotham')) == (data, 'cache')
+    # Геокодинг и погода, повторный запрос — из кэша
+    assert fake_api.requests == 2
+
+
+def test_city_not_found_is_cached(client, fake_api):
+    for _ in range(3):
+        with pytest.raises(ValueError, match="Город 'Unknownia' не найден"):
+            client.lookup(('city', 'Unknownia'))
+    assert fake_api.requests == 1
+    # Ненайденный город не становится популярным ключом для прогрева
+    assert client.cache.hot_keys(10) == []
+
+
+def test_api_error(client, fake_api):
+    fake_api.error_rate = 1.0
+    with pytest.raises(Exception, match='Ошибка API'):
+        client.lookup(('coords', 10.0, 20.0))
+    assert client.cache.peek(client.location_key(('coords', 10.0, 20.0))) is None
+
+
+def test_open_breaker_serves_expired_data(make_client, fake_api):
+    client = make_client(breakers=True, ttl_hours=0, stale_hours=0)
+    location = ('coords', 10.0, 20.0)
+    data, _ = client.lookup(location)
+
+    fake_api.error_rate = 1.0
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(Exception, match='Ошибка API'):
+            client.lookup(location)
+    requests = fake_api.requests
+
+    # Цепь разомкнута: в API не ходим, отдаем последние данные из кэша
+    assert client.lookup(location) == (data, 'expired')
+    with pytest.raises(CircuitOpenError):
+        client.lookup(('coords', 1.0, 2.0))
+    assert fake_api.requests == requests
+
+
+def test_typo_is_not_resolved_locally(client, fake_api):
+    client.lookup(('city', 'Gotham'))
+    requests = fake_api.requests
+
+    # Похожее название идет в удаленный геокодер, а не подменяется известным городом
+    assert client.geocoder.resolve('Gothan') is None
+    client.get_coords_by_city('Gothan')
+    assert fake_api.requests == requests + 1
+    assert client.geocoder.lookup('gothan') != client.geocoder.lookup('gotham')
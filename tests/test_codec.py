@@ -0,0 +1,55 @@
+"""Форматы записей кэша: RecordCodec, запасной JSON и сжатие ZlibCodec"""
+
+import json
+
+import pytest
+
+from weather.codec import MAGIC, RECORD, ZLIB_MAGIC, ZLIB_MIN_SIZE, RecordCodec, ZlibCodec
+
+CURRENT = {'utc_offset_seconds': 10800,
+           'current_weather': {'temperature': -3.2, 'windspeed': 14.5, 'winddirection': 270,
+                               'weathercode': 61, 'time': '2026-01-01T12:00', 'interval': 900}}
+
+
+def test_record_round_trip():
+    value = RecordCodec.encode(CURRENT)
+    assert value[:4] == MAGIC and len(value) == RECORD.size
+    assert RecordCodec.decode(value) == CURRENT
+
+
+@pytest.mark.parametrize('data', [
+    # Сотые доли, секунды во времени и лишние поля запись не передает без потерь
+    {'utc_offset_seconds': 0, 'current_weather': {'temperature': 1.25}},
+    {'utc_offset_seconds': 0, 'current_weather': {'time': '2026-01-01T12:00:30'}},
+    {'utc_offset_seconds': 0, 'current_weather': {'temperature': 1.0, 'humidity': 80}},
+    {'hourly': {'temperature_2m': [1.0, 2.0]}},
+])
+def test_lossy_values_fall_back_to_json(data):
+    value = RecordCodec.encode(data)
+    assert isinstance(value, str)
+    assert RecordCodec.decode(value) == data
+
+
+def test_legacy_json_is_readable():
+    assert RecordCodec.decode(json.dumps(CURRENT)) == CURRENT
+
+
+def test_corrupt_records():
+    with pytest.raises(ValueError):
+        RecordCodec.decode(RecordCodec.encode(CURRENT)[:-1])
+    with pytest.raises(ValueError):
+        ZlibCodec().decode(ZLIB_MAGIC + b'not zlib')
+
+
+def test_zlib_threshold():
+    codec = ZlibCodec()
+    # Запись текущей погоды короче порога и хранится как есть
+    assert codec.encode(CURRENT) == RecordCodec.encode(CURRENT)
+
+    forecast = {'hourly': {'temperature_2m': [round(i / 10, 1) for i in range(200)]}}
+    value = codec.encode(forecast)
+    assert len(RecordCodec.encode(forecast)) >= ZLIB_MIN_SIZE
+    assert value[:4] == ZLIB_MAGIC and len(value) < len(RecordCodec.encode(forecast))
+    assert codec.decode(value) == forecast
+    # Несжатые записи (до включения сжатия) читаются как раньше
+    assert codec.decode(RecordCodec.encode(forecast)) == forecast
@@ -0,0 +1,22 @@
+"""GeoIndex: выученные города переживают сжатие журнала в файл индекса"""
+
+from weather.geocoder import GeoIndex
+
+
+def test_compact_moves_learned_to_file(tmp_path):
+    index = GeoIndex(str(tmp_path / 'geocode.idx'))
+    index.learn('Gotham', 40.7, -74.0)
+    index.compact()
+    # После сжатия записи читаются из файла, а не из памяти
+    assert 'gotham' not in index._learned
+    assert index.lookup('GOTHAM').latitude == 40.7
+    assert index.lookup('Москва') is not None
+
+    index.learn('Metropolis', 41.0, -75.0)
+    index.compact()
+    assert index.lookup('gotham') is not None and index.lookup('metropolis') is not None
+    index.close()
+
+    reopened = GeoIndex(str(tmp_path / 'geocode.idx'))
+    assert reopened.lookup('metropolis').longitude == -75.0
+    reopened.close()
@@ -0,0 +1,58 @@
+"""HTTP-сервис погоды поверх клиента с заглушкой open-meteo"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from weather.server import WeatherService, make_server
+
+
+@pytest.fixture
+def service_url(client):
+    server = make_server(WeatherService(client), '127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, body=None):
+    """(статус, тело ответа) без исключений для ответов 4xx/5xx"""
+    try:
+        with urllib.request.urlopen(url, data=body, timeout=10) as response:
+            return response.status, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode('utf-8')
+
+
+def test_weather(service_url):
+    status, body = request(f"{service_url}/weather?lat=10&lon=20")
+    assert status == 200
+    first = json.loads(body)
+    assert first['query'] == {'lat': 10.0, 'lon': 20.0} and first['source'] == 'api'
+
+    second = json.loads(request(f"{service_url}/weather?lat=10&lon=20")[1])
+    assert second['source'] == 'cache' and second['data'] == first['data']
+
+
+def test_weather_errors(service_url, fake_api):
+    status, body = request(f"{service_url}/weather?city=Unknownia")
+    assert status == 404 and 'не найден' in json.loads(body)['error']
+    assert request(f"{service_url}/weather")[0] == 400
+
+    fake_api.error_rate = 1.0
+    status, body = request(f"{service_url}/weather?lat=1&lon=2")
+    assert status == 502 and 'Ошибка API' in json.loads(body)['error']
+
+
+def test_batch(service_url):
+    status, body = request(f"{service_url}/weather/batch?concurrency=4", 'Москва\n10,20\n'.encode('utf-8'))
+    assert status == 200
+    records = [json.loads(line) for line in body.splitlines()]
+    assert sorted(record['source'] for record in records) == ['api', 'api']
+
+    for concurrency in ('0', '-1', 'x'):
+        assert request(f"{service_url}/weather/batch?concurrency={concurrency}", b'10,20\n')[0] == 400
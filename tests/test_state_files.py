@@ -0,0 +1,41 @@
+"""Файлы состояния ограничителя и выключателя: личный каталог, ссылки, время из будущего"""
+
+import os
+import stat
+import time
+
+import pytest
+
+from weather import breaker, ratelimit
+from weather.locking import state_file
+
+
+def test_state_dir_is_private(state_dir):
+    path = state_file('ratelimit')
+    assert os.path.dirname(path) == str(state_dir)
+    assert stat.S_IMODE(os.stat(state_dir).st_mode) == 0o700
+
+
+def test_symlink_is_not_followed(state_dir, tmp_path):
+    target = tmp_path / 'victim'
+    target.write_bytes(b'')
+    os.symlink(target, state_file('ratelimit'))
+    with pytest.raises(OSError):
+        ratelimit.RateLimiter(path=state_file('ratelimit')).acquire()
+    assert target.read_bytes() == b''
+
+
+def test_future_timestamps_are_ignored(state_dir):
+    future = time.time() + 24 * 3600
+    limiter = ratelimit.RateLimiter(path=state_file('ratelimit'))
+    with open(limiter.path, 'wb') as f:
+        f.write(ratelimit.STATE.pack(0.0, future, future))
+    assert limiter.acquire(ratelimit.BACKGROUND) < 1
+
+    circuit = breaker.CircuitBreaker('api', path=state_file('breaker'))
+    with open(circuit.path, 'wb') as f:
+        f.write(breaker.STATE.pack(breaker.FAILURE_THRESHOLD, future, future))
+    with pytest.raises(breaker.CircuitOpenError) as error:
+        circuit.before_call()
+    # Цепь разомкнута не дольше обычного reset_timeout
+    assert error.value.retry_after <= breaker.RESET_TIMEOUT
@@ -0,0 +1,23 @@
+"""Прогрев кэша: учет ошибок геокодинга и запроса погоды"""
+
+from weather.cache import WeatherCache
+from weather.warming import Warmer
+
+
+class FailingAPI:
+    def get_coords_by_city(self, name):
+        raise ValueError(f"Город '{name}' не найден")
+
+    def get_weather_by_coords_many(self, coords):
+        raise RuntimeError('Ошибка API')
+
+
+def test_errors_counted_once_per_key(tmp_path):
+    cache = WeatherCache(cache_file=str(tmp_path / 'weather_cache.db'), legacy_file=None)
+    warmer = Warmer(cache, FailingAPI())
+    stats = {'refreshed': 0, 'requests': 0, 'errors': 0}
+    keys = ['city_unknownia', cache.coords_key(10.0, 20.0), cache.coords_key(-10.0, 50.0)]
+    warmer._refresh(keys, stats)
+    # Один ненайденный город и две точки в неудачном запросе
+    assert stats == {'refreshed': 0, 'requests': 1, 'errors': 3}
+    cache.close()
@@ -0,0 +1,13 @@
+"""
+Адрес HTTP-сервиса. Отдельно от server.py, чтобы разбор аргументов CLI
+не импортировал http.server.
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+
+def parse_address(value):
+    """'host:port', ':port' или 'port' -> (host, port)"""
+    host, _, port = value.rpartition(':')
+    return host or DEFAULT_HOST, int(port)
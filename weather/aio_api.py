@@ -0,0 +1,160 @@
+"""
+Асинхронный аналог weather/api.py.
+Запросы выполняются в ограниченном пуле потоков поверх общей HTTP-сессии
+(пул соединений и повторы из session.py), а asyncio позволяет совместить
+геокодинг одних городов с загрузкой погоды для других.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api as sync_api
+from .batch import emit_chunk, emit_error
+from .ratelimit import current_lane, in_lane
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def _run(func, *args):
+    # Поток пула выполняет запрос в полосе ограничителя вызывающего потока
+    return await asyncio.get_running_loop().run_in_executor(None, in_lane, current_lane(), func, *args)
+
+
+async def get_weather_by_coords(lat, lon):
+    return await _run(sync_api.get_weather_by_coords, lat, lon)
+
+
+async def get_weather_by_coords_many(coords):
+    return await _run(sync_api.get_weather_by_coords_many, coords)
+
+
+async def get_coords_by_city(city):
+    return await _run(sync_api.get_coords_by_city, city)
+
+
+class Fetcher:
+    """
+    Конкурентная загрузка погоды для многих точек.
+    Одновременно выполняется не более concurrency HTTP-запросов;
+    попадания в кэш сеть не трогают, а одинаковые города геокодируются один раз.
+    api — объект или модуль с синхронными get_coords_by_city,
+    get_weather_by_coords и get_weather_by_coords_many.
+    """
+
+    def __init__(self, api=sync_api, cache=None, key_func=None, concurrency=DEFAULT_CONCURRENCY):
+        self.api = api
+        self.cache = cache
+        self.key_func = key_func
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # Полоса ограничителя частоты, в которой Fetcher создан (batch — фоновая)
+        self.lane = current_lane()
+        self._semaphore = None
+        self._geocoding = {}
+
+    async def _call(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, in_lane, self.lane, func, *args)
+
+    async def get_coords(self, city):
+        """Координаты города; повторные запросы ждут уже идущий геокодинг"""
+        task = self._geocoding.get(city)
+        if task is None:
+            task = asyncio.ensure_future(self._call(self.api.get_coords_by_city, city))
+            self._geocoding[city] = task
+        return tuple(await task)
+
+    async def resolve(self, location):
+        """Координаты точки пакетного режима: ('city', name) или ('coords', lat, lon)"""
+        if location[0] == 'city':
+            return await self.get_coords(location[1])
+        return location[1:]
+
+    async def get_weather(self, location):
+        """Возвращает (source, data) для одной точки"""
+        key = self.key_func(location) if self.key_func else None
+        if self.cache is not None and key is not None:
+            data = self.cache.get(key)
+            if data is not None:
+                return 'cache', data
+
+        lat, lon = await self.resolve(location)
+        data = await self._call(self.api.get_weather_by_coords, lat, lon)
+        if self.cache is not None and key is not None:
+            self.cache.set(key, data)
+        return 'api', data
+
+    async def get_weather_many(self, coords):
+        return await self._call(self.api.get_weather_by_coords_many, coords)
+
+    async def fetch(self, locations):
+        """Асинхронный генератор (location, source, data, error) в порядке готовности"""
+        async def one(location):
+            try:
+                source, data = await self.get_weather(location)
+                return location, source, data, None
+            except Exception as e:
+                return location, None, None, e
+
+        for future in asyncio.as_completed([one(location) for location in locations]):
+            yield await future
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def fetch_misses(misses, api, cache, out, stats, chunk_size, concurrency):
+    """
+    Параллельная часть пакетного режима: города геокодируются конкурентно,
+    и как только набирается пачка координат, она уходит в запрос погоды,
+    не дожидаясь остальных городов.
+    """
+    fetcher = Fetcher(api, concurrency=concurrency)
+    pending = {}   # (lat, lon) -> [(location, key), ...]
+    done = {}      # (lat, lon) -> данные уже загруженной точки
+    loads = []
+    chunk = []
+
+    async def resolve(key, group):
+        items = [(location, key) for location in group]
+        try:
+            return items, await fetcher.resolve(group[0])
+        except Exception as e:
+            emit_error(out, items, e, stats)
+            return items, None
+
+    async def load(coords_list):
+        try:
+            results = await fetcher.get_weather_many(coords_list)
+        except Exception as e:
+            emit_error(out, [item for coords in coords_list for item in pending.pop(coords)], e, stats)
+            return
+        done.update(zip(coords_list, results))
+        emit_chunk(out, [pending.pop(coords) for coords in coords_list], results, cache, stats)
+
+    try:
+        for future in asyncio.as_completed([resolve(key, group) for key, group in misses]):
+            items, coords = await future
+            if coords is None:
+                continue
+            if coords in done:
+                # Другой город с теми же координатами уже загружен
+                emit_chunk(out, [items], [done[coords]], cache, stats)
+                continue
+            if coords in pending:
+                pending[coords].extend(items)
+                continue
+            pending[coords] = items
+            chunk.append(coords)
+            if len(chunk) >= chunk_size:
+                loads.append(asyncio.ensure_future(load(chunk)))
+                chunk = []
+
+        if chunk:
+            loads.append(asyncio.ensure_future(load(chunk)))
+        await asyncio.gather(*loads)
+    finally:
+        fetcher.close()
@@ -1,18 +1,26 @@
-import requests
+"""
+Функции поверх общего клиента (client.get_default_client) — для кода,
+которому удобнее модуль, чем объект (например, aio_api). Ответы в формате
+open-meteo, как у WeatherClient.
+"""
+
+from .client import get_default_client
+from .forecast import FORECAST_DAYS
+
 
 def get_weather_by_coords(lat, lon):
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
-    response = requests.get(url, timeout=5)
-    response.raise_for_status()
-    data = response.json()
-    return data["current_weather"]
+    return get_default_client().get_weather_by_coords(lat, lon)
+
+
+def get_weather_by_coords_many(coords):
+    """Текущая погода сразу для нескольких точек одним запросом"""
+    return get_default_client().get_weather_by_coords_many(coords)
+
+
+def get_forecast_by_coords(lat, lon, days=FORECAST_DAYS):
+    """Почасовой и суточный прогноз точки на days дней"""
+    return get_default_client().get_forecast_by_coords(lat, lon, days)
+
 
 def get_coords_by_city(city):
-    url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1"
-    response = requests.get(url, timeout=5)
-    response.raise_for_status()
-    data = response.json()
-    if "results" not in data:
-        raise ValueError("Город не найден.")
-    coords = data["results"][0]
-    return coords["latitude"], coords["longitude"]
\ No newline at end of file
+    return get_default_client().get_coords_by_city(city)
@@ -0,0 +1,109 @@
+"""
+Источники данных о погоде. WeatherClient работает с любым объектом
+с интерфейсом Backend; ответы — в формате open-meteo (current_weather,
+utc_offset_seconds, ...), прогноз — Forecast, геокодинг — результат
+геокодера open-meteo или None.
+Повторы, пул соединений и ограничение частоты живут в session.HTTPClient
+и достаются всем источникам поверх HTTP.
+"""
+
+import os
+
+from .forecast import DAILY, FORECAST_DAYS, HOURLY, Forecast
+from .session import get_client
+
+# Адреса можно переопределить, например, для локальной заглушки в бенчмарках
+FORECAST_URL = os.environ.get("WEATHER_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+GEOCODING_URL = os.environ.get("WEATHER_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+
+
+class Backend:
+    """Интерфейс источника данных"""
+
+    def current(self, latitude, longitude):
+        """Текущая погода точки"""
+        raise NotImplementedError
+
+    def current_many(self, coords):
+        """Текущая погода для списка (lat, lon) в том же порядке"""
+        return [self.current(latitude, longitude) for latitude, longitude in coords]
+
+    def forecast(self, latitude, longitude, days=FORECAST_DAYS):
+        """Почасовой и суточный прогноз на days дней"""
+        raise NotImplementedError
+
+    def geocode(self, name):
+        """Лучший результат геокодинга ({'latitude', 'longitude', 'name', ...}) или None"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class OpenMeteoBackend(Backend):
+    """open-meteo.com поверх общей HTTP-сессии"""
+
+    def __init__(self, http=None, forecast_url=FORECAST_URL, geocoding_url=GEOCODING_URL):
+        self.forecast_url = forecast_url
+        self.geocoding_url = geocoding_url
+        # Сессия создается при первом запросе: запуск, которому хватает кэша,
+        # не импортирует requests
+        self._http = http
+
+    @property
+    def http(self):
+        """Общая сессия: keep-alive, пул соединений, повторы с backoff и таймаут"""
+        if self._http is None:
+            self._http = get_client()
+        return self._http
+
+    def _get_json(self, url, error, **options):
+        """Запрос к open-meteo; ошибки сети и HTTP превращаются в Exception с текстом error"""
+        import requests
+
+        try:
+            return self.http.get_json(url, **options)
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"{error}: {e}")
+
+    def current(self, latitude, longitude):
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'current_weather': True,
+            'timezone': 'auto',
+            'forecast_days': 1
+        }
+        return self._get_json(self.forecast_url, "Ошибка API", params=params)
+
+    def current_many(self, coords):
+        """Все точки одним запросом"""
+        params = {
+            'latitude': ','.join(str(lat) for lat, _ in coords),
+            'longitude': ','.join(str(lon) for _, lon in coords),
+            'current_weather': True,
+            'timezone': 'auto',
+            'forecast_days': 1
+        }
+        data = self._get_json(self.forecast_url, "Ошибка API", params=params, timeout=10)
+        # Для одной точки open-meteo возвращает объект, для нескольких — список
+        return [data] if isinstance(data, dict) else data
+
+    def forecast(self, latitude, longitude, days=FORECAST_DAYS):
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'hourly': ','.join(name for name, _, _ in HOURLY),
+            # time — ось суточного ряда, а не переменная: open-meteo ее не принимает
+            'daily': ','.join(name for name, _, _ in DAILY if name != 'time'),
+            'forecast_days': days,
+            'timezone': 'auto',
+            'timeformat': 'unixtime'
+        }
+        data = self._get_json(self.forecast_url, "Ошибка API", params=params, timeout=10)
+        return Forecast.from_response(data)
+
+    def geocode(self, name):
+        data = self._get_json(self.geocoding_url, "Ошибка геокодинга", params={'name': name, 'count': 1})
+        results = data.get('results')
+        return results[0] if results else None
@@ -0,0 +1,183 @@
+"""
+Пакетный режим: погода для множества точек за один запуск.
+Вход — CSV (в строке город или широта,долгота) или JSONL
+({"city": ...} или {"lat": ..., "lon": ...}); результат — JSONL,
+который выводится по мере готовности каждой пачки.
+"""
+
+import csv
+import json
+
+from .ratelimit import BACKGROUND, lane
+
+# Сколько точек запрашивать у open-meteo за один запрос
+CHUNK_SIZE = 100
+
+HEADER_FIELDS = {'city', 'name', 'lat', 'lon', 'latitude', 'longitude'}
+
+
+def _parse_coords(lat, lon):
+    return 'coords', float(lat), float(lon)
+
+
+def _parse_json_line(line):
+    item = json.loads(line)
+    if 'city' in item:
+        return 'city', str(item['city']).strip()
+    if 'lat' in item and 'lon' in item:
+        return _parse_coords(item['lat'], item['lon'])
+    if 'latitude' in item and 'longitude' in item:
+        return _parse_coords(item['latitude'], item['longitude'])
+    raise ValueError("ожидается city или lat/lon")
+
+
+def _parse_csv_line(line):
+    fields = [field.strip() for field in next(csv.reader([line]))]
+    if all(field.lower() in HEADER_FIELDS for field in fields):
+        # Строка заголовка
+        return None
+    if len(fields) == 2:
+        try:
+            return _parse_coords(*fields)
+        except ValueError:
+            pass
+    return 'city', ', '.join(fields)
+
+
+def parse_location(text):
+    """Точка из строки CSV (город или широта,долгота) или JSON; None для строки заголовка"""
+    text = text.strip()
+    if text.startswith('{'):
+        return _parse_json_line(text)
+    return _parse_csv_line(text)
+
+
+def read_locations(stream):
+    """Читает точки из CSV/JSONL и убирает точные повторы, сохраняя порядок"""
+    locations = []
+    seen = set()
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            location = parse_location(line)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Строка {line_no}: не удалось разобрать точку ({e})")
+        if location is None or location in seen:
+            continue
+        seen.add(location)
+        locations.append(location)
+    return locations
+
+
+def describe(location):
+    """Запрос в том виде, в котором он попадает в выходную запись"""
+    if location[0] == 'city':
+        return {'city': location[1]}
+    return {'lat': location[1], 'lon': location[2]}
+
+
+def _emit(out, location, **fields):
+    record = {'query': describe(location), **fields}
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def run_batch(locations, api, cache, key_func, out, chunk_size=CHUNK_SIZE, concurrency=1):
+    """
+    Отдает попадания из кэша за один проход, затем догружает промахи
+    пачками по chunk_size точек одним запросом на пачку.
+    api — объект с get_coords_by_city и get_weather_by_coords_many,
+    cache — WeatherCache или None, key_func строит ключ кэша для точки.
+    При concurrency > 1 геокодинг и пачки выполняются параллельно (см. aio_api).
+    Запросы идут в фоновой полосе ограничителя частоты и уступают интерактивным.
+    Возвращает счетчики по источникам данных.
+    """
+    # Полоса только этого потока: пул потоков aio_api переносит ее в свои задачи,
+    # а интерактивные запросы других потоков (сервис) остаются в своей полосе
+    with lane(BACKGROUND):
+        return _run_batch(locations, api, cache, key_func, out, chunk_size, concurrency)
+
+
+def _run_batch(locations, api, cache, key_func, out, chunk_size, concurrency):
+    stats = {'cache': 0, 'api': 0, 'errors': 0}
+    misses = serve_hits(locations, cache, key_func, out, stats)
+
+    if concurrency > 1:
+        import asyncio
+
+        from .aio_api import fetch_misses
+        asyncio.run(fetch_misses(misses, api, cache, out, stats, chunk_size, concurrency))
+        return stats
+
+    pending = {}  # (lat, lon) -> [(location, key), ...]
+    for key, group in misses:
+        location = group[0]
+        try:
+            if location[0] == 'city':
+                coords = tuple(api.get_coords_by_city(location[1]))
+            else:
+                coords = location[1:]
+        except Exception as e:
+            emit_error(out, [(item, key) for item in group], e, stats)
+            continue
+        pending.setdefault(coords, []).extend((item, key) for item in group)
+    out.flush()
+
+    all_coords = list(pending)
+    for start in range(0, len(all_coords), chunk_size):
+        chunk = all_coords[start:start + chunk_size]
+        try:
+            results = api.get_weather_by_coords_many(chunk)
+        except Exception as e:
+            emit_error(out, [item for coords in chunk for item in pending[coords]], e, stats)
+            continue
+        emit_chunk(out, [pending[coords] for coords in chunk], results, cache, stats)
+
+    return stats
+
+
+def serve_hits(locations, cache, key_func, out, stats):
+    """
+    Выводит попадания из кэша и возвращает промахи как [(key, [location, ...]), ...].
+    Точки с одинаковым ключом (например, соседние координаты в одной ячейке)
+    проверяются и загружаются один раз, но в вывод попадает каждая.
+    """
+    groups = {}
+    for location in locations:
+        groups.setdefault(key_func(location), []).append(location)
+
+    misses = []
+    for key, group in groups.items():
+        data = cache.get(key) if cache is not None else None
+        if data is None:
+            misses.append((key, group))
+            continue
+        for location in group:
+            _emit(out, location, source='cache', data=data)
+            stats['cache'] += 1
+    out.flush()
+    return misses
+
+
+def emit_error(out, items, error, stats):
+    """Выводит ошибку для каждой точки из items = [(location, key), ...]"""
+    for location, _ in items:
+        _emit(out, location, error=str(error))
+        stats['errors'] += 1
+
+
+def emit_chunk(out, groups, results, cache, stats):
+    """
+    Выводит и кэширует результаты пачки: groups[i] — точки,
+    которым соответствует results[i].
+    """
+    fresh = {}
+    for items, data in zip(groups, results):
+        for location, key in items:
+            _emit(out, location, source='api', data=data)
+            fresh[key] = data
+            stats['api'] += 1
+    if cache is not None:
+        cache.set_many(fresh.items())
+    out.flush()
@@ -0,0 +1,121 @@
+"""
+Автоматический выключатель (circuit breaker) для запросов к API.
+
+    closed    — запросы идут; threshold ошибок подряд размыкают цепь;
+    open      — запросы сразу завершаются CircuitOpenError, без таймаутов;
+    half-open — через reset_timeout пропускается один пробный запрос:
+                успех замыкает цепь, ошибка снова размыкает ее.
+
+С path состояние хранится в файле под блокировкой и общее для всех
+процессов (как у ratelimit): во время сбоя таймаут платит один процесс,
+а не каждый запуск CLI.
+"""
+
+import math
+import struct
+import threading
+import time
+from contextlib import nullcontext
+
+from . import metrics
+from .locking import file_lock, open_state
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0      # секунд в open до пробного запроса
+PROBE_TIMEOUT = 30.0      # дольше этого пробный запрос не ждем и пускаем следующий
+
+# ошибки подряд, когда цепь разомкнулась, до какого момента идет пробный запрос
+STATE = struct.Struct('<idd')
+
+
+class CircuitOpenError(Exception):
+    """API недоступен: цепь разомкнута после серии ошибок"""
+
+    def __init__(self, name, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"{name} недоступен, повторная попытка через {math.ceil(retry_after)} с")
+
+
+class CircuitBreaker:
+    """Выключатель для одного API; path — файл общего для процессов состояния или None"""
+
+    def __init__(self, name, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 probe_timeout=PROBE_TIMEOUT, path=None):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = (0, 0.0, 0.0)
+
+    def before_call(self):
+        """Пропускает запрос или бросает CircuitOpenError"""
+        def check(state, now):
+            failures, opened_at, probe_until = state
+            if failures < self.threshold:
+                return state, None
+            reopen = opened_at + self.reset_timeout
+            if now < reopen:
+                return state, reopen - now
+            if now < probe_until:
+                # Пробный запрос уже идет в другом потоке или процессе
+                return state, probe_until - now
+            metrics.inc('breaker_probes', api=self.name)
+            return (failures, opened_at, now + self.probe_timeout), None
+
+        retry_after = self._update(check)
+        if retry_after is not None:
+            metrics.inc('breaker_rejected', api=self.name)
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        def close(state, now):
+            if state[0] >= self.threshold:
+                metrics.inc('breaker_closed', api=self.name)
+            return (0, 0.0, 0.0), None
+        self._update(close)
+
+    def record_failure(self):
+        def fail(state, now):
+            failures = state[0] + 1
+            if failures < self.threshold:
+                return (failures, 0.0, 0.0), None
+            if failures == self.threshold or state[2]:
+                # Цепь размыкается заново и после неудачного пробного запроса
+                metrics.inc('breaker_opened', api=self.name)
+            return (failures, now, 0.0), None
+        self._update(fail)
+
+    @property
+    def is_open(self):
+        return self._update(lambda state, now: (state, state[0] >= self.threshold))
+
+    def _update(self, func):
+        """func(state, now) → (новое состояние, результат) под блокировкой"""
+        with self._lock, (file_lock(self.path) if self.path else nullcontext()):
+            if self.path is None:
+                state, result = func(self._state, time.time())
+                self._state = state
+                return result
+            with open_state(self.path) as f:
+                raw = f.read(STATE.size)
+                now = time.time()
+                current = self._sane(STATE.unpack(raw), now) if len(raw) == STATE.size else (0, 0.0, 0.0)
+                state, result = func(current, now)
+                if state != current:
+                    f.seek(0)
+                    f.write(STATE.pack(*state))
+            return result
+
+    def _sane(self, state, now):
+        """
+        Состояние из файла без времени из будущего: иначе переведенные часы
+        или испорченный файл держали бы цепь разомкнутой сколь угодно долго
+        """
+        failures, opened_at, probe_until = state
+        if not 0 <= opened_at <= now:
+            opened_at = now
+        if not probe_until <= now + self.probe_timeout:
+            probe_until = 0.0
+        return failures, opened_at, probe_until
@@ -1,85 +1,384 @@
 import json
 import os
+import sqlite3
+import sys
+import threading
 import time
-from datetime import datetime, timedelta
+from contextlib import nullcontext
+from datetime import timedelta
+
+from . import metrics
+from .codec import RecordCodec
+from .locking import file_lock
+from .lru import DEFAULT_CAPACITY, LRUCache
+from .singleflight import SingleFlight
+from .spatial import SpatialGrid
+from .storage import SQLiteStorage, migrate_json
+
+# Сколько просроченных записей удалять за одну порцию очистки
+PURGE_BATCH = 100
+REFRESH_WORKERS = 4
+# Обращения к ключам копятся в памяти и сбрасываются в хранилище пачкой
+ACCESS_FLUSH_EVERY = 1000
+CITY_PREFIX = 'city_'
+# Отрицательные записи («город не найден») живут недолго и не смешиваются с данными
+NEGATIVE_PREFIX = 'miss_'
+NEGATIVE_TTL = 10 * 60
+
 
 class WeatherCache:
-    def __init__(self, cache_file='weather_cache.json', ttl_hours=1):
+    """
+    Кэш погоды с мягким и жестким TTL.
+    До ttl_hours запись свежая; еще stale_hours после этого get_or_fetch отдает
+    ее сразу и обновляет в фоне; позже запись считается отсутствующей.
+    """
+
+    def __init__(self, cache_file='weather_cache.db', ttl_hours=1, storage=None,
+                 legacy_file='weather_cache.json', spatial=None, stale_hours=1,
+                 process_locks=True, memory_capacity=DEFAULT_CAPACITY, codec=RecordCodec):
         self.cache_file = cache_file
+        # Сериализация записей для хранилища: encode(data) и decode(value), см. codec
+        self.codec = codec
         self.ttl = timedelta(hours=ttl_hours)
-        self._ensure_cache_file()
-    
-    def _ensure_cache_file(self):
-        """Создает файл кэша, если он не существует"""
-        if not os.path.exists(self.cache_file):
-            with open(self.cache_file, 'w') as f:
-                json.dump({}, f)
-    
+        self.hard_ttl = timedelta(hours=ttl_hours + stale_hours)
+        self.storage = storage if storage is not None else SQLiteStorage(cache_file)
+        # Первый уровень в памяти: запись идет сквозь него в хранилище
+        self.memory = None
+        if memory_capacity:
+            self.memory = LRUCache(memory_capacity, max_age=self.hard_ttl.total_seconds())
+        # Квантование координат в ячейки для ключей вида geo_<geohash>
+        self.spatial = spatial if spatial is not None else SpatialGrid()
+        # Каталог файлов блокировок, чтобы ключ загружал только один процесс
+        self.lock_dir = f"{cache_file}.locks" if process_locks else None
+        # Счетчики для метрик (stats); инкременты без блокировки, чтобы не
+        # замедлять get, поэтому при гонках возможна потеря единиц
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expirations = 0
+        self.purged = 0
+        # Обращения к ключам с последнего сброса (для прогрева популярных ключей)
+        self._accesses = {}
+        self._access_count = 0
+        self._flight = SingleFlight()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._executor = None
+        if legacy_file and os.path.exists(legacy_file):
+            migrate_json(legacy_file, self.storage)
+
+    @metrics.timed('cache_get')
     def get(self, key):
-        """Получает данные из кэша по ключу"""
+        """
+        Получает данные из кэша по ключу.
+        Для ключа ячейки при промахе берет данные ближайшей закэшированной соседней ячейки.
+        """
+        data = self._get(key)
+        if data is None and self.spatial.is_cell_key(key):
+            for nearby_key in self.spatial.nearby(key):
+                data = self._get(nearby_key)
+                if data is not None:
+                    break
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._accesses[key] = self._accesses.get(key, 0) + 1
+        self._access_count += 1
+        if self._access_count % ACCESS_FLUSH_EVERY == 0:
+            self.flush_access()
+        return data
+
+    def coords_key(self, lat, lon):
+        """Ключ кэша для координат"""
+        return self.spatial.key(lat, lon)
+
+    def generate_key(self, latitude=None, longitude=None, city=None):
+        """Сгенерировать ключ для кэша"""
+        if city:
+            return f"{CITY_PREFIX}{city.lower()}"
+        elif latitude is not None and longitude is not None:
+            # Ячейка geohash: близкие точки делят одну запись кэша
+            return self.coords_key(latitude, longitude)
+        else:
+            raise ValueError("Должны быть указаны либо город, либо координаты")
+
+    def location_key(self, location):
+        """Ключ кэша для точки ('city', name) или ('coords', lat, lon)"""
+        if location[0] == 'city':
+            return self.generate_key(city=location[1])
+        return self.generate_key(latitude=location[1], longitude=location[2])
+
+    def key_location(self, key):
+        """Точка по ключу кэша — обратное к location_key (для прогрева)"""
+        if key.startswith(CITY_PREFIX):
+            return 'city', key[len(CITY_PREFIX):]
+        if self.spatial.is_cell_key(key):
+            return ('coords', *self.spatial.center(key))
+        return 'city', key
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Данные по ключу с загрузкой через fetch() при необходимости.
+        Возвращает (data, source), где source — 'cache', 'stale' или 'api'.
+        Устаревшая запись отдается сразу, а обновляется в фоне; одновременные
+        промахи по одному ключу выполняют один fetch на процесс (и на все
+        процессы, если включены файловые блокировки).
+        """
+        data = self.get(key)
+        if data is not None:
+            return data, 'cache'
+
+        found = self._lookup(key)
+        if found is not None:
+            self.stale += 1
+            self._refresh_in_background(key, fetch)
+            return found[1], 'stale'
+
+        return self._flight.do(key, lambda: self._fetch_and_store(key, fetch, blocking=True))
+
+    def peek(self, key):
+        """(data, fresh) для записи моложе жесткого TTL или None; ничего не загружает"""
+        found = self._lookup(key)
+        if found is None:
+            return None
+        return found[1], found[0] < self.ttl.total_seconds()
+
+    def _lookup(self, key):
+        """(возраст, данные) записи моложе жесткого TTL или None"""
+        stale = None
+        if self.memory is not None:
+            entry = self.memory.get(key)
+            if entry is not None:
+                age = time.time() - entry[0]
+                if age < self.ttl.total_seconds():
+                    return age, entry[1]
+                # Другой процесс мог уже обновить запись в хранилище
+                stale = age, entry[1]
+
+        try:
+            entry = self.storage.get(key)
+            if entry is None:
+                return stale
+
+            timestamp, value = entry
+            age = time.time() - timestamp
+            if stale is not None and age >= stale[0]:
+                return stale
+            if age < self.hard_ttl.total_seconds():
+                data = self._decode(value)
+                if self.memory is not None:
+                    self.memory.set(key, timestamp, data, len(value))
+                return age, data
+
+            # Окончательно просроченную запись не удаляем: ее отдает last_known,
+            # пока API недоступен, а убирает порционная очистка
+            self.expirations += 1
+            return None
+
+        except (sqlite3.Error, json.JSONDecodeError, ValueError) as e:
+            print(f"Ошибка чтения кэша: {e}", file=sys.stderr)
+            return None
+
+    def last_known(self, key):
+        """Последние сохраненные данные по ключу независимо от возраста или None"""
+        try:
+            entry = self.storage.get(key)
+            return self._decode(entry[1]) if entry is not None else None
+        except (sqlite3.Error, json.JSONDecodeError, ValueError) as e:
+            print(f"Ошибка чтения кэша: {e}", file=sys.stderr)
+            return None
+
+    def set_missing(self, key, error, ttl=NEGATIVE_TTL):
+        """
+        Запоминает на ttl секунд, что по ключу ничего нет (error — текст ошибки).
+        Обращения к такому ключу не делают его популярным для прогрева
+        """
+        self._remove_expired()
+        now = time.time()
+        try:
+            self.storage.set(NEGATIVE_PREFIX + key, now, self._encode({'error': error, 'expires': now + ttl}))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Ошибка кэширования: {e}", file=sys.stderr)
+        self.forget_access(key)
+
+    def forget_access(self, key):
+        """Убирает накопленные и сохраненные обращения к ключу"""
+        self._accesses.pop(key, None)
         try:
-            if not os.path.exists(self.cache_file):
+            self.storage.forget_access([key])
+        except sqlite3.Error as e:
+            print(f"Ошибка записи статистики обращений: {e}", file=sys.stderr)
+
+    def get_missing(self, key):
+        """Текст ошибки из действующей отрицательной записи или None"""
+        try:
+            entry = self.storage.get(NEGATIVE_PREFIX + key)
+            if entry is None:
                 return None
-                
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-            
-            if key in cache:
-                cached_data = cache[key]
-                # Проверяем, не истекло ли время жизни кэша
-                cached_time = datetime.fromisoformat(cached_data['timestamp'])
-                if datetime.now() - cached_time < self.ttl:
-                    return cached_data['data']
-                else:
-                    # Удаляем просроченные данные
-                    self._remove_expired()
-                    return None
-                    
-        except (json.JSONDecodeError, KeyError, ValueError, IOError) as e:
-            print(f"Ошибка чтения кэша: {e}")
+            record = self._decode(entry[1])
+        except (sqlite3.Error, json.JSONDecodeError, ValueError) as e:
+            print(f"Ошибка чтения кэша: {e}", file=sys.stderr)
             return None
-    
+        if record.get('expires', 0) <= time.time():
+            return None
+        return record.get('error')
+
+    def _get(self, key):
+        found = self._lookup(key)
+        # Проверяем, не истекло ли время жизни кэша
+        if found is not None and found[0] < self.ttl.total_seconds():
+            return found[1]
+        return None
+
+    def _process_lock(self, key, blocking):
+        if self.lock_dir is None:
+            return nullcontext(True)
+        # Файл на каждый ключ: блокировка держится на время загрузки, и общий
+        # файл заставил бы ждать чужие ключи. hashlib нужен только при промахе
+        import hashlib
+        os.makedirs(self.lock_dir, exist_ok=True)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return file_lock(os.path.join(self.lock_dir, f"{name}.lock"), blocking=blocking)
+
+    def _fetch_and_store(self, key, fetch, blocking):
+        with self._process_lock(key, blocking) as acquired:
+            if not acquired:
+                # Этот ключ уже обновляет другой процесс
+                return None, 'stale'
+            # Пока ждали блокировку, запись мог обновить другой процесс
+            data = self._get(key)
+            if data is not None:
+                return data, 'cache'
+            data = fetch()
+            self.set(key, data)
+            return data, 'api'
+
+    def _refresh_in_background(self, key, fetch):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                # concurrent.futures тянет logging: импортируем, только когда нужно обновление
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS)
+        self._executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key, fetch):
+        try:
+            self._flight.do(key, lambda: self._fetch_and_store(key, fetch, blocking=False))
+        except Exception as e:
+            print(f"Ошибка фонового обновления кэша: {e}", file=sys.stderr)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """Счетчики кэша для metrics.register"""
+        counters = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'expirations': self.expirations,
+            'purged': self.purged,
+        }
+        if self.memory is not None:
+            memory = self.memory.stats()
+            counters['memory_hits'] = memory['hits']
+            counters['memory_evictions'] = memory['evictions']
+        return counters
+
+    def flush_access(self):
+        """Сбрасывает накопленные обращения к ключам в счета популярности хранилища"""
+        counts, self._accesses = self._accesses, {}
+        if not counts:
+            return
+        try:
+            self.storage.record_access(counts, time.time())
+        except sqlite3.Error as e:
+            print(f"Ошибка записи статистики обращений: {e}", file=sys.stderr)
+
+    def hot_keys(self, limit):
+        """До limit самых популярных ключей: [(key, счет, время записи или None)]"""
+        self.flush_access()
+        try:
+            return self.storage.hot_keys(limit, time.time())
+        except sqlite3.Error as e:
+            print(f"Ошибка чтения статистики обращений: {e}", file=sys.stderr)
+            return []
+
+    def close(self):
+        """Дожидается фоновых обновлений и сохраняет статистику обращений"""
+        with self._refresh_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.flush_access()
+
+    @metrics.timed('cache_set')
     def set(self, key, data):
         """Сохраняет данные в кэш"""
+        self._remove_expired()
+        now = time.time()
         try:
-            # Читаем существующий кэш
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
-            else:
-                cache = {}
-            
-            # Обновляем кэш
-            cache[key] = {
-                'timestamp': datetime.now().isoformat(),
-                'data': data
-            }
-            
-            # Записываем обратно
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, indent=2, ensure_ascii=False)
-                
-        except Exception as e:
-            print(f"Ошибка кэширования: {e}")
-    
-    def _remove_expired(self):
-        """Удаляет все просроченные записи"""
+            value = self._encode(data)
+            self.storage.set(key, now, value)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Ошибка кэширования: {e}", file=sys.stderr)
+            return
+        if self.memory is not None:
+            self.memory.set(key, now, data, len(value))
+
+    def set_many(self, items):
+        """Сохраняет пачку пар (key, data) одной записью в хранилище"""
+        self._remove_expired()
+        now = time.time()
         try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-            
-            # Фильтруем просроченные записи
-            current_time = datetime.now()
-            valid_cache = {}
-            
-            for key, value in cache.items():
-                cached_time = datetime.fromisoformat(value['timestamp'])
-                if current_time - cached_time < self.ttl:
-                    valid_cache[key] = value
-            
-            # Сохраняем обратно
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(valid_cache, f, indent=2, ensure_ascii=False)
-                
-        except Exception as e:
-            print(f"Ошибка очистки кэша: {e}")
\ No newline at end of file
+            encoded = [(key, data, self._encode(data)) for key, data in items]
+            self.storage.set_many([(key, now, value) for key, _, value in encoded])
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Ошибка кэширования: {e}", file=sys.stderr)
+            return
+        if self.memory is not None:
+            for key, data, value in encoded:
+                self.memory.set(key, now, data, len(value))
+
+    def _encode(self, data):
+        """Сериализует данные для хранилища"""
+        return self.codec.encode(data)
+
+    def _decode(self, value):
+        """Восстанавливает данные из хранилища"""
+        return self.codec.decode(value)
+
+    @metrics.timed('cache_remove_expired')
+    def _remove_expired(self, limit=PURGE_BATCH):
+        """
+        Удаляет порцию записей (и отрицательных тоже) старше жесткого TTL.
+        Вызывается перед каждой записью: так очистка не зависит от того, сколько
+        пишет один процесс, новая запись не удаляется даже при нулевом TTL,
+        а при недоступном API, когда записей нет, просроченные данные
+        остаются для last_known
+        """
+        try:
+            removed = self.storage.purge_expired(time.time() - self.hard_ttl.total_seconds(), limit)
+        except sqlite3.Error as e:
+            print(f"Ошибка очистки кэша: {e}", file=sys.stderr)
+            return 0
+        self.purged += removed
+        return removed
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Возвращает общий для процесса экземпляр кэша"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = WeatherCache()
+            metrics.register('cache', _default_cache.stats)
+        return _default_cache
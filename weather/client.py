@@ -0,0 +1,157 @@
+"""
+Клиент погоды — общий слой для main.py, команд пакета (weather.main),
+HTTP-сервиса и GUI:
+
+    backend (источник: open-meteo по HTTP или любой Backend)
+      → индекс городов (геокодинг без сети для известных городов)
+      → кэш (память → SQLite, мягкий/жесткий TTL, объединение запросов)
+      → formatting (вывод)
+
+Методы get_* — прямые запросы к источнику в том виде, который ждут
+пакетный режим, прогрев и наблюдение; lookup/peek/refresh работают через кэш.
+Ненайденные города кэшируются ненадолго (отрицательные записи), а пока
+источник недоступен (breaker), lookup отдает последние данные из кэша.
+"""
+
+import threading
+
+from . import metrics
+from .backend import OpenMeteoBackend
+from .breaker import CircuitOpenError
+from .cache import get_default_cache
+from .codec import normalize_current
+from .forecast import FORECAST_DAYS
+from .geocoder import get_default_index
+
+
+def learn_from_result(index, query, result):
+    """Запоминает ответ геокодера под запросом и под каноническим названием"""
+    population = result.get('population') or 0
+    index.learn(query, result['latitude'], result['longitude'], population)
+    if result.get('name'):
+        index.learn(result['name'], result['latitude'], result['longitude'], population)
+
+
+class WeatherClient:
+    """
+    backend — источник данных (по умолчанию OpenMeteoBackend),
+    cache — WeatherCache или None (без кэша), geocoder — GeoIndex
+    (по умолчанию общий индекс; открывается при первом геокодинге).
+    """
+
+    def __init__(self, backend=None, cache=None, geocoder=None):
+        self.backend = backend if backend is not None else OpenMeteoBackend()
+        self.cache = cache
+        self._geocoder = geocoder
+
+    @property
+    def geocoder(self):
+        """Локальный индекс городов, пополняется ответами геокодера"""
+        if self._geocoder is None:
+            self._geocoder = get_default_index()
+        return self._geocoder
+
+    @metrics.timed()
+    def get_weather_by_coords(self, latitude, longitude):
+        """Получить погоду по координатам (в схеме записей кэша, см. codec.normalize_current)"""
+        return normalize_current(self.backend.current(latitude, longitude))
+
+    @metrics.timed()
+    def get_weather_by_coords_many(self, coords):
+        """Получить погоду сразу для нескольких точек"""
+        return [normalize_current(data) for data in self.backend.current_many(coords)]
+
+    @metrics.timed()
+    def get_forecast_by_coords(self, latitude, longitude, days=FORECAST_DAYS):
+        """Получить почасовой и суточный прогноз на days дней"""
+        return self.backend.forecast(latitude, longitude, days)
+
+    @metrics.timed()
+    def get_coords_by_city(self, city_name):
+        """Получить координаты города: локальный индекс, затем геокодер источника"""
+        place = self.geocoder.resolve(city_name)
+        if place is not None:
+            return place.latitude, place.longitude
+
+        key = self.cache.generate_key(city=city_name) if self.cache is not None else None
+        if key is not None:
+            error = self.cache.get_missing(key)
+            if error is not None:
+                metrics.inc('geocode_negative_hits')
+                # Обращение уже учтено в cache.get, но прогревать нечего
+                self.cache.forget_access(key)
+                raise ValueError(error)
+
+        result = self.backend.geocode(city_name)
+        if result is None:
+            suggestions = ', '.join(place.name for _, place in self.geocoder.fuzzy(city_name, limit=3))
+            hint = f" Возможно, вы имели в виду: {suggestions}." if suggestions else ""
+            error = f"Город '{city_name}' не найден.{hint} Используйте координаты."
+            if key is not None:
+                self.cache.set_missing(key, error)
+            raise ValueError(error)
+
+        learn_from_result(self.geocoder, city_name, result)
+        return result['latitude'], result['longitude']
+
+    def get_weather_by_city(self, city_name):
+        """Получить погоду по названию города (через геокодинг)"""
+        return self.get_weather_by_coords(*self.get_coords_by_city(city_name))
+
+    def fetch(self, location):
+        """Погода для точки ('city', name) или ('coords', lat, lon) из источника, мимо кэша"""
+        if location[0] == 'city':
+            return self.get_weather_by_city(location[1])
+        return self.get_weather_by_coords(location[1], location[2])
+
+    def location_key(self, location):
+        return self.cache.location_key(location)
+
+    def lookup(self, location):
+        """
+        (data, source) для точки: source — 'cache', 'stale' (обновляется в фоне),
+        'api' или 'expired' (источник недоступен, данные старше жесткого TTL).
+        Без кэша всегда идет в источник.
+        """
+        if self.cache is None:
+            return self.fetch(location), 'api'
+        key = self.location_key(location)
+        try:
+            return self.cache.get_or_fetch(key, lambda: self.fetch(location))
+        except CircuitOpenError:
+            data = self.cache.last_known(key)
+            if data is None:
+                raise
+            metrics.inc('cache_expired_served')
+            return data, 'expired'
+
+    def peek(self, location):
+        """(data, fresh) из кэша или None; ничего не загружает"""
+        if self.cache is None:
+            return None
+        return self.cache.peek(self.location_key(location))
+
+    def refresh(self, location):
+        """Загружает точку из источника и обновляет кэш"""
+        data = self.fetch(location)
+        if self.cache is not None:
+            self.cache.set(self.location_key(location), data)
+        return data
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        self.backend.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client():
+    """Общий для процесса клиент: источник open-meteo и общий кэш"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = WeatherClient(cache=get_default_cache())
+        return _default_client
@@ -0,0 +1,202 @@
+"""
+Форматы записей кэша (параметр codec у WeatherCache): encode(data) → str/bytes,
+decode(value) → data.
+
+RecordCodec хранит ответ open-meteo с текущей погодой фиксированной записью
+struct (21 байт вместо ~250 байт JSON): только поля, которые читают
+format_weather_data, GUI и --watch; температура и ветер — десятые доли
+в int16, время — epoch-секунды (строка времени при чтении берется из общего
+кэша строк), код погоды WMO — один байт. Метаданные
+ответа (координаты сетки, высота, generationtime_ms, единицы) не хранятся.
+Все остальное (другие форматы данных, значения, которые запись не передает
+без потерь) сохраняется как JSON, так что кодек подходит для любых записей,
+а старые JSON-записи читаются как раньше. normalize_current приводит ответ
+API к той же схеме, что и запись из кэша: клиент отдает одни и те же поля
+независимо от источника.
+
+ZlibCodec — необязательный сжатый уровень поверх любого кодека: значения
+длиннее min_size сжимаются zlib (zstd в стандартной библиотеке нет).
+"""
+
+import json
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+
+MAGIC = b'WCW1'
+# magic, температура и скорость ветра (десятые), направление ветра, код погоды,
+# время (epoch), смещение UTC, интервал обновления
+RECORD = struct.Struct('<4shHHBIiH')
+ZLIB_MAGIC = b'WCZ1'
+ZLIB_MIN_SIZE = 256
+
+MISSING_SHORT = -0x8000
+MISSING_USHORT = 0xFFFF
+MISSING_BYTE = 0xFF
+
+# Поля ответа, которые никто не читает и запись отбрасывает
+DROPPED = frozenset({
+    'latitude', 'longitude', 'generationtime_ms', 'timezone',
+    'timezone_abbreviation', 'elevation', 'current_weather_units',
+})
+CURRENT_DROPPED = frozenset({'is_day'})
+CURRENT_FIELDS = frozenset({'temperature', 'windspeed', 'winddirection', 'weathercode', 'time', 'interval'})
+
+
+class JSONCodec:
+    """Формат записей по умолчанию: компактный JSON"""
+
+    @staticmethod
+    def encode(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    @staticmethod
+    def decode(value):
+        return json.loads(value)
+
+
+def _tenths(value, low, high):
+    """Значение в десятых долях или None, если его не передать без потерь"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    scaled = round(value * 10)
+    if not low <= scaled <= high or abs(scaled - value * 10) > 1e-6:
+        return None
+    return scaled
+
+
+def _whole(value, high):
+    """Целое в [0, high) или None"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < high:
+        return None
+    return value
+
+
+def _field(current, name, pack, missing):
+    """Упакованное поле, missing, если поля нет, или None, если его не упаковать без потерь"""
+    if name not in current:
+        return missing
+    return pack(current[name])
+
+
+# Время current_weather кратно 15 минутам и повторяется во всех записях
+# одного обновления: строки переиспользуются, а не собираются заново
+@lru_cache(maxsize=4096)
+def _local_time(timestamp, offset):
+    t = time.gmtime(timestamp + offset)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}T{t.tm_hour:02d}:{t.tm_min:02d}"
+
+
+def normalize_current(data):
+    """
+    Ответ с текущей погодой без полей, которые запись не хранит (DROPPED,
+    is_day), и с utc_offset_seconds — как после записи в кэш и чтения
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('current_weather'), dict):
+        return data
+    result = {key: value for key, value in data.items() if key not in DROPPED}
+    result['current_weather'] = {key: value for key, value in data['current_weather'].items()
+                                 if key not in CURRENT_DROPPED}
+    result.setdefault('utc_offset_seconds', 0)
+    return result
+
+
+def pack_current(data):
+    """Запись RECORD для ответа с текущей погодой или None, если ответ в нее не укладывается"""
+    if not isinstance(data, dict) or not isinstance(data.get('current_weather'), dict):
+        return None
+    if not data.keys() <= DROPPED | {'current_weather', 'utc_offset_seconds'}:
+        return None
+    current = data['current_weather']
+    if not current.keys() - CURRENT_DROPPED <= CURRENT_FIELDS:
+        return None
+    offset = data.get('utc_offset_seconds', 0)
+    if isinstance(offset, bool) or not isinstance(offset, int) or not -86400 < offset < 86400:
+        return None
+
+    values = (
+        _field(current, 'temperature', lambda v: _tenths(v, -0x7FFF, 0x7FFF), MISSING_SHORT),
+        _field(current, 'windspeed', lambda v: _tenths(v, 0, MISSING_USHORT - 1), MISSING_USHORT),
+        _field(current, 'winddirection', lambda v: _whole(v, MISSING_USHORT), MISSING_USHORT),
+        _field(current, 'weathercode', lambda v: _whole(v, MISSING_BYTE), MISSING_BYTE),
+        _field(current, 'interval', lambda v: _whole(v, MISSING_USHORT) or None, 0),
+    )
+    if None in values:
+        return None
+    temperature, windspeed, direction, code, interval = values
+
+    timestamp = 0
+    if 'time' in current:
+        try:
+            local = datetime.fromisoformat(current['time']).replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            return None
+        timestamp = int(local.timestamp()) - offset
+        # Только формат open-meteo без секунд восстанавливается строка в строку
+        if not 0 < timestamp < 2 ** 32 or _local_time(timestamp, offset) != current['time']:
+            return None
+    return RECORD.pack(MAGIC, temperature, windspeed, direction, code, timestamp, offset, interval)
+
+
+def unpack_current(value):
+    _, temperature, windspeed, direction, code, timestamp, offset, interval = RECORD.unpack(value)
+    current = {}
+    if temperature != MISSING_SHORT:
+        current['temperature'] = temperature / 10
+    if windspeed != MISSING_USHORT:
+        current['windspeed'] = windspeed / 10
+    if direction != MISSING_USHORT:
+        current['winddirection'] = direction
+    if code != MISSING_BYTE:
+        current['weathercode'] = code
+    if timestamp:
+        current['time'] = _local_time(timestamp, offset)
+    if interval:
+        current['interval'] = interval
+    return {'utc_offset_seconds': offset, 'current_weather': current}
+
+
+class RecordCodec:
+    """Текущая погода — записью RECORD, остальное — JSON"""
+
+    @staticmethod
+    def encode(data):
+        record = pack_current(data)
+        return record if record is not None else JSONCodec.encode(data)
+
+    @staticmethod
+    def decode(value):
+        if isinstance(value, (bytes, memoryview)) and value[:4] == MAGIC:
+            if len(value) != RECORD.size:
+                raise ValueError("Поврежденная запись кэша")
+            return unpack_current(value)
+        return JSONCodec.decode(value)
+
+
+class ZlibCodec:
+    """Сжимает zlib значения inner длиннее min_size; читает и несжатые"""
+
+    def __init__(self, inner=RecordCodec, min_size=ZLIB_MIN_SIZE, level=6):
+        self.inner = inner
+        self.min_size = min_size
+        self.level = level
+
+    def encode(self, data):
+        value = self.inner.encode(data)
+        if len(value) < self.min_size:
+            return value
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        return ZLIB_MAGIC + zlib.compress(value, self.level)
+
+    def decode(self, value):
+        if isinstance(value, (bytes, memoryview)) and value[:4] == ZLIB_MAGIC:
+            try:
+                value = zlib.decompress(value[4:])
+            except zlib.error:
+                raise ValueError("Поврежденная сжатая запись кэша")
+        return self.inner.decode(value)
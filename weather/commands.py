@@ -1,27 +1,49 @@
-from . import api, cache
+import sys
+
+from . import batch, server, warming
+from .address import DEFAULT_HOST, DEFAULT_PORT, parse_address
+from .client import get_default_client
+from .formatting import format_weather_line
+
+SOURCE_PREFIXES = {"cache": "[КЭШ] ", "stale": "[КЭШ, обновляется] ", "api": "",
+                   "expired": "[КЭШ, API недоступен] "}
 
 def handle_command(args):
-    if args.command == "city":
-        city = args.name
-        cached = cache.get_from_cache(city)
-        if cached:
-            print(f"[КЭШ] Погода в {city}: {cached['temperature']}°C, ветер {cached['windspeed']} м/с")
-            return
+    client = get_default_client()
+
+    if args.command in ("city", "coords"):
+        if args.command == "city":
+            location = ("city", args.name)
+        else:
+            location = ("coords", args.lat, args.lon)
+        weather, source = client.lookup(location)
+        print(SOURCE_PREFIXES[source] + format_weather_line(location, weather))
 
-        print("Получаю данные с API...")
-        lat, lon = api.get_coords_by_city(city)
-        weather = api.get_weather_by_coords(lat, lon)
-        cache.save_to_cache(city, weather)
-        print(f"Погода в {city}: {weather['temperature']}°C, ветер {weather['windspeed']} м/с")
+    elif args.command == "batch":
+        if args.file == "-":
+            locations = batch.read_locations(sys.stdin)
+        else:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                locations = batch.read_locations(f)
+        stats = batch.run_batch(
+            locations, client, client.cache, client.location_key, sys.stdout,
+            chunk_size=getattr(args, "chunk_size", batch.CHUNK_SIZE),
+            concurrency=getattr(args, "concurrency", 1)
+        )
+        print(f"Из кэша: {stats['cache']}, с API: {stats['api']}, ошибок: {stats['errors']}", file=sys.stderr)
 
-    elif args.command == "coords":
-        key = f"{args.lat},{args.lon}"
-        cached = cache.get_from_cache(key)
-        if cached:
-            print(f"[КЭШ] Погода ({key}): {cached['temperature']}°C, ветер {cached['windspeed']} м/с")
-            return
+    elif args.command == "serve":
+        host, port = parse_address(getattr(args, "address", f"{DEFAULT_HOST}:{DEFAULT_PORT}"))
+        server.serve(server.WeatherService(client), host, port)
 
-        print("Получаю данные с API...")
-        weather = api.get_weather_by_coords(args.lat, args.lon)
-        cache.save_to_cache(key, weather)
-        print(f"Погода ({key}): {weather['temperature']}°C, ветер {weather['windspeed']} м/с")
\ No newline at end of file
+    elif args.command == "warm":
+        warmer = warming.Warmer(
+            client.cache, client,
+            top=getattr(args, "top", warming.WARM_TOP),
+            rpm=getattr(args, "rpm", warming.WARM_RPM)
+        )
+        if getattr(args, "once", False):
+            stats = warmer.run_once()
+            print(f"Прогрето: {stats['refreshed']}, запросов: {stats['requests']}, ошибок: {stats['errors']}", file=sys.stderr)
+        else:
+            warmer.run()
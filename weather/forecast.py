@@ -0,0 +1,216 @@
+"""
+Почасовой и суточный прогноз в компактном колоночном виде.
+Каждая переменная — типизированный массив (модуль array). Почасовой ряд
+в unixtime равномерный, поэтому время задается началом и шагом, а поиск
+часа — арифметика индекса; суточный ряд (местные полуночи, при переходе
+на летнее время сутки короче) хранит колонку времени. Запись в кэше — несколько сотен байт вместо
+вложенного JSON. Один запрос прогноза отвечает на запросы о любом часе окна.
+"""
+
+import bisect
+import math
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from .cache import WeatherCache
+from .codec import ZlibCodec
+
+# Окно начинается с местной полуночи, поэтому 3 дня покрывают любые 48 часов вперед
+FORECAST_DAYS = 3
+FORECAST_HORIZON_HOURS = (FORECAST_DAYS - 1) * 24
+FORECAST_CACHE_FILE = 'weather_forecast.db'
+# Прогноз на ближайшие часы почти не меняется между обновлениями моделей:
+# запись свежая 3 часа и служит устаревшей до конца суток
+FORECAST_TTL_HOURS = 3
+FORECAST_STALE_HOURS = 21
+
+HOUR = 3600
+DAY = 86400
+
+# (переменная open-meteo, поле в ответе, тип элемента массива)
+HOURLY = (
+    ('temperature_2m', 'temperature', 'f'),
+    ('windspeed_10m', 'windspeed', 'f'),
+    ('winddirection_10m', 'winddirection', 'h'),
+    ('weathercode', 'weathercode', 'b'),
+)
+DAILY = (
+    ('time', 'time', 'q'),
+    ('temperature_2m_max', 'temperature_max', 'f'),
+    ('temperature_2m_min', 'temperature_min', 'f'),
+    ('precipitation_sum', 'precipitation', 'f'),
+    ('weathercode', 'weathercode', 'b'),
+)
+# Пропуск в целочисленных колонках; в вещественных — NaN
+MISSING = -1
+
+MAGIC = b'WFC1'
+# magic, смещение UTC, начало и длина почасового ряда, длина суточного
+HEADER = struct.Struct('<4siqII')
+
+
+def _column(typecode, values):
+    if typecode == 'f':
+        return array('f', (math.nan if v is None else v for v in values))
+    return array(typecode, (MISSING if v is None else int(v) for v in values))
+
+
+def _value(typecode, column, index):
+    value = column[index]
+    if typecode == 'f':
+        return None if math.isnan(value) else round(value, 1)
+    return None if value == MISSING else value
+
+
+def _series_start(times):
+    """Начало почасового ряда; неравномерный ряд — ошибка"""
+    if not times:
+        return 0
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] != HOUR:
+            raise ValueError("Неравномерный почасовой ряд прогноза")
+    return times[0]
+
+
+class Forecast:
+    """Почасовой и суточный ряды одной точки"""
+
+    __slots__ = ('utc_offset', 'hourly_start', 'hourly', 'daily')
+
+    def __init__(self, utc_offset, hourly_start, hourly, daily):
+        self.utc_offset = utc_offset
+        self.hourly_start = hourly_start
+        self.hourly = hourly
+        self.daily = daily
+
+    @classmethod
+    def from_response(cls, data):
+        """Из ответа open-meteo, запрошенного с timeformat=unixtime"""
+        hourly, daily = data.get('hourly', {}), data.get('daily', {})
+        hourly_times, daily_times = hourly.get('time', []), daily.get('time', [])
+        return cls(
+            data.get('utc_offset_seconds', 0),
+            _series_start(hourly_times),
+            {field: _column(typecode, hourly.get(name, [None] * len(hourly_times)))
+             for name, field, typecode in HOURLY},
+            {field: _column(typecode, daily.get(name, [None] * len(daily_times)))
+             for name, field, typecode in DAILY},
+        )
+
+    @property
+    def hours(self):
+        return len(self.hourly['temperature'])
+
+    @property
+    def days(self):
+        return len(self.daily['time'])
+
+    def covers(self, when):
+        """Попадает ли момент (epoch-секунды) в почасовое окно"""
+        return 0 <= self._hour_index(when) < self.hours
+
+    def _hour_index(self, when):
+        # Ближайший час: почасовые значения open-meteo — мгновенные на начало часа
+        return round((when - self.hourly_start) / HOUR)
+
+    def _local_time(self, timestamp):
+        local = datetime.fromtimestamp(timestamp, timezone.utc) + timedelta(seconds=self.utc_offset)
+        return local.strftime('%Y-%m-%dT%H:%M')
+
+    def at(self, when):
+        """Погода на момент when в формате current_weather; ValueError вне окна"""
+        index = self._hour_index(when)
+        if not 0 <= index < self.hours:
+            raise ValueError("Момент вне окна прогноза")
+        point = {field: _value(typecode, self.hourly[field], index)
+                 for _, field, typecode in HOURLY}
+        point['time'] = self._local_time(self.hourly_start + index * HOUR)
+        return point
+
+    def day(self, when):
+        """Суточные значения для дня, в который попадает when, или None"""
+        times = self.daily['time']
+        index = bisect.bisect_right(times, when) - 1
+        if index < 0 or when >= times[index] + DAY:
+            return None
+        summary = {field: _value(typecode, self.daily[field], index)
+                   for _, field, typecode in DAILY if field != 'time'}
+        summary['date'] = self._local_time(times[index])[:10]
+        return summary
+
+    def to_bytes(self):
+        parts = [HEADER.pack(MAGIC, self.utc_offset, self.hourly_start, self.hours, self.days)]
+        for columns, spec in ((self.hourly, HOURLY), (self.daily, DAILY)):
+            for _, field, _ in spec:
+                column = columns[field]
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, value):
+        value = bytes(value)
+        try:
+            magic, utc_offset, hourly_start, hours, days = HEADER.unpack_from(value)
+        except struct.error:
+            raise ValueError("Поврежденная запись прогноза")
+        if magic != MAGIC:
+            raise ValueError("Неизвестный формат записи прогноза")
+
+        offset = HEADER.size
+        series = []
+        for count, spec in ((hours, HOURLY), (days, DAILY)):
+            columns = {}
+            for _, field, typecode in spec:
+                column = array(typecode)
+                size = column.itemsize * count
+                if offset + size > len(value):
+                    raise ValueError("Поврежденная запись прогноза")
+                column.frombytes(value[offset:offset + size])
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                columns[field] = column
+                offset += size
+            series.append(columns)
+        return cls(utc_offset, hourly_start, series[0], series[1])
+
+
+class ForecastCodec:
+    """Формат записей кэша прогнозов"""
+
+    @staticmethod
+    def encode(forecast):
+        return forecast.to_bytes()
+
+    @staticmethod
+    def decode(value):
+        return Forecast.from_bytes(value)
+
+
+def open_cache(cache_file=FORECAST_CACHE_FILE, compress=False, **options):
+    """
+    Отдельный кэш прогнозов: у него свои TTL, и очистка не задевает текущую погоду.
+    compress — хранить записи сжатыми zlib (см. codec.ZlibCodec)
+    """
+    return WeatherCache(cache_file=cache_file, ttl_hours=FORECAST_TTL_HOURS,
+                        stale_hours=FORECAST_STALE_HOURS, legacy_file=None,
+                        codec=ZlibCodec(ForecastCodec) if compress else ForecastCodec, **options)
+
+
+def forecast_at(cache, key, fetch, when=None):
+    """
+    Погода на момент when (по умолчанию — сейчас) из кэша прогнозов.
+    fetch() возвращает Forecast. Если закэшированное окно уже не покрывает
+    when, прогноз загружается заново. Возвращает (point, day, source).
+    """
+    when = time.time() if when is None else when
+    forecast, source = cache.get_or_fetch(key, fetch)
+    if not forecast.covers(when):
+        forecast, source = fetch(), 'api'
+        cache.set(key, forecast)
+    return forecast.at(when), forecast.day(when), source
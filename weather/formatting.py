@@ -0,0 +1,127 @@
+"""
+Форматирование погоды для вывода: рамка format_weather_data для одиночного
+запроса и строка format_weather_line для потока изменений (--watch, команды).
+"""
+
+from datetime import datetime
+
+from . import metrics
+from .batch import describe
+
+
+# Румбы через 45°, начиная с севера
+WIND_DIRECTIONS = ('С', 'СВ', 'В', 'ЮВ', 'Ю', 'ЮЗ', 'З', 'СЗ')
+
+# Описание погоды по коду (WMO)
+WEATHER_DESCRIPTIONS = {
+    0: 'Ясно',
+    1: 'Преимущественно ясно',
+    2: 'Переменная облачность',
+    3: 'Пасмурно',
+    45: 'Туман',
+    48: 'Туман с инеем',
+    51: 'Лежащая морось',
+    53: 'Морось',
+    55: 'Сильная морось',
+    56: 'Ледяная морось',
+    57: 'Сильная ледяная морось',
+    61: 'Небольшой дождь',
+    63: 'Умеренный дождь',
+    65: 'Сильный дождь',
+    66: 'Ледяной дождь',
+    67: 'Сильный ледяной дождь',
+    71: 'Небольшой снег',
+    73: 'Умеренный снег',
+    75: 'Сильный снег',
+    77: 'Снежные зерна',
+    80: 'Небольшой ливень',
+    81: 'Умеренный ливень',
+    82: 'Сильный ливень',
+    85: 'Небольшой снегопад',
+    86: 'Сильный снегопад',
+    95: 'Гроза',
+    96: 'Гроза с градом',
+    99: 'Сильная гроза с градом'
+}
+
+
+def temperature_to_units(temperature: float, units: str) -> float:
+    """Конвертировать температуру в нужные единицы"""
+    if units == 'fahrenheit':
+        return (temperature * 9/5) + 32
+    return temperature
+
+
+def get_wind_direction(degree: float) -> str:
+    """Определить направление ветра по градусам"""
+    return WIND_DIRECTIONS[round(degree / 45) % 8]
+
+
+@metrics.timed()
+def format_weather_data(weather_data: dict, units: str = 'celsius') -> str:
+    """Отформатировать данные о погоде для вывода"""
+    current = weather_data.get('current_weather', {})
+    
+    temperature = current.get('temperature', 0)
+    wind_speed = current.get('windspeed', 0)
+    wind_direction = current.get('winddirection', 0)
+    weather_code = current.get('weathercode', 0)
+    time = current.get('time', '')
+    
+    # Конвертируем температуру
+    temp_value = temperature_to_units(temperature, units)
+    temp_unit = '°C' if units == 'celsius' else '°F'
+    
+    weather_desc = WEATHER_DESCRIPTIONS.get(weather_code, 'Неизвестно')
+    wind_dir = get_wind_direction(wind_direction)
+    
+    # Форматируем время
+    if time:
+        try:
+            dt = datetime.fromisoformat(time.replace('Z', '+00:00'))
+            formatted_time = dt.strftime("%d.%m.%Y %H:%M")
+        except:
+            formatted_time = time
+    else:
+        formatted_time = "Неизвестно"
+    
+    result = [
+        "┌──────────────────────────────┐",
+        "│           ПОГОДА             │",
+        "├──────────────────────────────┤",
+        f"│ Температура: {temp_value:5.1f} {temp_unit:3} │",
+        f"│ Погода: {weather_desc:19} │",
+        f"│ Ветер: {wind_speed:3.1f} м/с, {wind_dir:2}     │",
+        f"│ Время: {formatted_time:19} │",
+        "└──────────────────────────────┘"
+    ]
+    
+    return '\n'.join(result)
+
+
+SOURCE_HEADERS = {
+    'cache': "📁 Данные из кэша:",
+    'stale': "📁 Данные из кэша (обновляются в фоне):",
+    'api': "🌤️  Данные из API:",
+    'expired': "📁 Устаревшие данные из кэша (API недоступен):",
+}
+
+
+def format_location(location: tuple) -> str:
+    """Название города или координаты точки"""
+    query = describe(location)
+    return query.get('city') or f"{query['lat']}, {query['lon']}"
+
+
+def format_weather_line(location: tuple, weather_data: dict, units: str = 'celsius') -> str:
+    """Погода в точке одной строкой: для потока изменений и коротких ответов команд"""
+    current = weather_data.get('current_weather', {})
+    place = format_location(location)
+    temp_unit = '°C' if units == 'celsius' else '°F'
+    temperature = temperature_to_units(current.get('temperature', 0), units)
+    weather_desc = WEATHER_DESCRIPTIONS.get(current.get('weathercode', 0), 'Неизвестно')
+    wind_dir = get_wind_direction(current.get('winddirection', 0))
+    return (
+        f"[{current.get('time', '?').replace('T', ' ')}] {place}: {temperature:.1f} {temp_unit}, "
+        f"{weather_desc}, ветер {current.get('windspeed', 0):.1f} м/с {wind_dir}"
+    )
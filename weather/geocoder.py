@@ -0,0 +1,381 @@
+"""
+Локальный геокодер: индекс городов в файле, который читается через mmap,
+и журнал координат, выученных из ответов удаленного геокодера.
+Поиск нечувствителен к регистру и диакритике (ё = е, é = e).
+
+Формат файла индекса:
+    заголовок: b'WGEO', версия (uint16), число записей (uint32)
+    смещения записей: uint32 на запись, записи отсортированы по ключу
+    записи: "ключ\\tимя\\tширота\\tдолгота\\tнаселение\\n" в UTF-8
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from collections import namedtuple
+
+from .locking import atomic_write, file_lock
+
+INDEX_FILE = 'geocode.idx'
+# Сколько выученных записей копить в журнале до пересборки индекса
+COMPACT_EVERY = 200
+
+MAGIC = b'WGEO'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+OFFSET = struct.Struct('<I')
+
+Place = namedtuple('Place', 'name latitude longitude population')
+
+# Города, известные без индекса и сети
+BUILTIN_CITIES = {
+    'Москва': (55.7558, 37.6173),
+    'Санкт-Петербург': (59.9343, 30.3351),
+    'Новосибирск': (55.0084, 82.9357),
+    'Екатеринбург': (56.8389, 60.6057),
+    'Казань': (55.7961, 49.1064),
+    'Нижний Новгород': (56.3269, 44.0075),
+    'Челябинск': (55.1644, 61.4368),
+    'Самара': (53.1951, 50.1069),
+    'Омск': (54.9924, 73.3686),
+    'Ростов-на-Дону': (47.2225, 39.7187),
+    'Уфа': (54.7355, 55.9587),
+    'Красноярск': (56.0153, 92.8932),
+    'Пермь': (58.0105, 56.2502),
+    'Воронеж': (51.6720, 39.1843),
+    'Волгоград': (48.7080, 44.5133),
+    'Сочи': (43.5855, 39.7231),
+    'Краснодар': (45.0355, 38.9750),
+    'Саратов': (51.5336, 46.0343),
+    'Тюмень': (57.1530, 65.5343),
+    'Иркутск': (52.2864, 104.2806),
+}
+
+
+def normalize(name):
+    """Ключ поиска: нижний регистр, без диакритики, дефисы и пробелы схлопнуты"""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.replace('-', ' ').replace('_', ' ').split())
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Число правок (вставка, удаление, замена, перестановка соседних букв)
+    или max_distance + 1, если оно больше порога.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _record(key, place):
+    return (f"{key}\t{place.name}\t{place.latitude:.5f}\t{place.longitude:.5f}"
+            f"\t{place.population}\n").encode('utf-8')
+
+
+def _parse_record(line):
+    key, name, lat, lon, population = line.split('\t')
+    return key, Place(name, float(lat), float(lon), int(population))
+
+
+def build_index(places, path=INDEX_FILE):
+    """
+    Собирает файл индекса из пар (имя, Place).
+    Для одинаковых ключей первым идет город с большим населением.
+    Возвращает число записей.
+    """
+    unique = {}
+    for name, place in places:
+        key = normalize(name)
+        if not key:
+            continue
+        ident = (key, round(place.latitude, 2), round(place.longitude, 2))
+        if ident not in unique or unique[ident].population < place.population:
+            unique[ident] = place
+
+    records = sorted(
+        ((ident[0].encode('utf-8'), -place.population, _record(ident[0], place))
+         for ident, place in unique.items())
+    )
+    offsets = bytearray()
+    body = bytearray()
+    base = HEADER.size + OFFSET.size * len(records)
+    for _, _, record in records:
+        offsets += OFFSET.pack(base + len(body))
+        body += record
+
+    atomic_write(path, HEADER.pack(MAGIC, VERSION, len(records)) + bytes(offsets) + bytes(body))
+    return len(records)
+
+
+def read_geonames(path, min_population=0):
+    """
+    Читает дамп GeoNames (cities*.txt, allCountries.txt) и возвращает пары (имя, Place)
+    для основного, ASCII- и альтернативных названий.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15:
+                continue
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            place = Place(fields[1], float(fields[4]), float(fields[5]), population)
+            names = {fields[1], fields[2], *fields[3].split(',')}
+            for name in names:
+                if name:
+                    yield name, place
+
+
+class _IndexFile:
+    """Снимок файла индекса: mmap и число записей; читается без блокировок"""
+
+    __slots__ = ('mm', 'count')
+
+    def __init__(self, mm, count):
+        self.mm = mm
+        self.count = count
+
+    def _offset(self, i):
+        return OFFSET.unpack_from(self.mm, HEADER.size + OFFSET.size * i)[0]
+
+    def key_at(self, i):
+        start = self._offset(i)
+        return self.mm[start:self.mm.find(b'\t', start)]
+
+    def place_at(self, i):
+        start = self._offset(i)
+        line = self.mm[start:self.mm.find(b'\n', start)].decode('utf-8')
+        return _parse_record(line)
+
+    def bisect(self, key):
+        """Первая позиция с ключом >= key (key в байтах)"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, key):
+        encoded = key.encode('utf-8')
+        i = self.bisect(encoded)
+        if i < self.count and self.key_at(i) == encoded:
+            return self.place_at(i)[1]
+        return None
+
+    def scan_prefix(self, prefix):
+        encoded = prefix.encode('utf-8')
+        i = self.bisect(encoded)
+        while i < self.count and self.key_at(i).startswith(encoded):
+            yield self.place_at(i)
+            i += 1
+
+    def records(self):
+        return map(self.place_at, range(self.count))
+
+
+class GeoIndex:
+    """Поиск по файлу индекса (mmap) и по выученным в этом и других процессах записям"""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self._lock = threading.Lock()
+        # Поиск берет снимок один раз и не держит блокировку; пересборка
+        # подменяет снимок целиком (см. _open)
+        self._file = None
+        self._journal_size = 0
+        self._learned = {
+            normalize(name): Place(name, lat, lon, 0) for name, (lat, lon) in BUILTIN_CITIES.items()
+        }
+        self._open()
+        self._load_journal()
+
+    def _open(self):
+        # Новый снимок собираем целиком и подменяем одним присваиванием, затем
+        # закрываем старый mmap; поиск, который еще читал старый снимок,
+        # повторяется по новому (см. _read)
+        index = None
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER.size:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = HEADER.unpack_from(mm, 0)
+            if magic == MAGIC and version == VERSION:
+                index = _IndexFile(mm, count)
+            else:
+                mm.close()
+                print(f"Неизвестный формат индекса городов: {self.path}", file=sys.stderr)
+        old, self._file = self._file, index
+        if old is not None:
+            old.mm.close()
+
+    def _read(self, func, default):
+        """func(снимок файла индекса) или default, если файла нет"""
+        index = self._file
+        if index is None:
+            return default
+        try:
+            return func(index)
+        except ValueError:
+            # Пересборка закрыла mmap посреди чтения: читаем новый снимок
+            if self._file is index:
+                raise
+            return self._read(func, default)
+
+    def _load_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    key, place = _parse_record(line.rstrip('\n'))
+                except ValueError:
+                    continue
+                self._learned[key] = place
+                self._journal_size += 1
+
+    def _scan_prefix(self, prefix):
+        """Записи индекса, ключ которых начинается с prefix"""
+        return self._read(lambda index: list(index.scan_prefix(prefix)), [])
+
+    def lookup(self, name):
+        """Точное совпадение (без учета регистра и диакритики) или None"""
+        key = normalize(name)
+        place = self._learned.get(key)
+        if place is not None:
+            return place
+        return self._read(lambda index: index.lookup(key), None)
+
+    def search(self, prefix, limit=10):
+        """Города, название которых начинается с prefix; крупные первыми"""
+        key = normalize(prefix)
+        found = {}
+        # list() — снимок: learn в другом потоке может пополнить словарь
+        matches = [(k, p) for k, p in list(self._learned.items()) if k.startswith(key)]
+        for _, place in matches + list(self._scan_prefix(key)):
+            # Один город под разными названиями показываем один раз
+            found.setdefault((round(place.latitude, 2), round(place.longitude, 2)), place)
+        return sorted(found.values(), key=lambda p: -p.population)[:limit]
+
+    def fuzzy(self, name, max_distance=None, limit=5):
+        """
+        Города с названием не дальше max_distance правок от name.
+        Кандидаты берутся среди названий на ту же букву.
+        Возвращает список (расстояние, Place), ближайшие первыми.
+        """
+        key = normalize(name)
+        if not key:
+            return []
+        if max_distance is None:
+            max_distance = 1 if len(key) < 9 else 2
+
+        candidates = {k: place for k, place in list(self._learned.items()) if k.startswith(key[0])}
+        for k, place in self._scan_prefix(key[0]):
+            # Для одинаковых названий в индексе первым идет самый крупный город
+            candidates.setdefault(k, place)
+
+        scored = []
+        for k, place in candidates.items():
+            distance = edit_distance(key, k, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -place.population, k, place))
+        scored.sort()
+        return [(distance, place) for distance, _, _, place in scored[:limit]]
+
+    def resolve(self, name):
+        """
+        Координаты без обращения к сети: только точное совпадение нормализованного
+        названия. Похожие названия (fuzzy) — лишь подсказки, когда удаленный
+        геокодер город не нашел: опечатка может оказаться другим городом.
+        """
+        return self.lookup(name)
+
+    def learn(self, name, latitude, longitude, population=0):
+        """Запоминает координаты из ответа удаленного геокодера"""
+        key = normalize(name)
+        if not key:
+            return
+        place = Place(name, latitude, longitude, population)
+        with self._lock:
+            if self._learned.get(key) == place:
+                return
+            self._learned[key] = place
+            try:
+                with file_lock(self.journal_path + '.lock'):
+                    with open(self.journal_path, 'ab') as f:
+                        f.write(_record(key, place))
+                self._journal_size += 1
+                if self._journal_size >= COMPACT_EVERY:
+                    self._compact()
+            except OSError as e:
+                print(f"Ошибка записи индекса городов: {e}", file=sys.stderr)
+
+    def compact(self):
+        """Переносит журнал выученных городов в файл индекса"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        with file_lock(self.journal_path + '.lock'):
+            # Журнал мог дописать другой процесс
+            self._journal_size = 0
+            self._load_journal()
+            places = self._read(lambda index: list(index.records()), [])
+            places.extend(self._learned.items())
+            build_index(places, self.path)
+            open(self.journal_path, 'wb').close()
+            self._journal_size = 0
+        self._open()
+        # Записи, которые теперь находит файл индекса, в памяти не держим;
+        # остаются только те, что файл отдал бы иначе (тот же ключ у более крупного города)
+        for key, place in list(self._learned.items()):
+            found = self._read(lambda index: index.lookup(key), None)
+            if found is not None and _record(key, found) == _record(key, place):
+                del self._learned[key]
+
+    def close(self):
+        index, self._file = self._file, None
+        if index is not None:
+            index.mm.close()
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_index():
+    """Возвращает общий для процесса индекс городов"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = GeoIndex()
+        return _default_index
+
+
+def import_geonames(dump_path, index_path=INDEX_FILE, min_population=0):
+    """Собирает индекс из дампа GeoNames, сохраняя уже выученные города"""
+    index = GeoIndex(index_path)
+    places = list(read_geonames(dump_path, min_population))
+    places.extend(index._learned.items())
+    index.close()
+    return build_index(places, index_path)
@@ -0,0 +1,84 @@
+"""
+Межпроцессные advisory-блокировки на файлах (fcntl).
+На платформах без fcntl блокировки превращаются в no-op.
+"""
+
+import os
+import stat
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Не идем по символической ссылке, подложенной вместо файла блокировки или состояния
+O_NOFOLLOW = getattr(os, 'O_NOFOLLOW', 0)
+
+
+@contextmanager
+def file_lock(path, shared=False, blocking=True):
+    """
+    Держит блокировку файла path на время блока with.
+    С blocking=False не ждет: в with передается False, если файл уже заблокирован.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | O_NOFOLLOW, 0o644)
+    try:
+        acquired = True
+        if fcntl is not None:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                acquired = False
+        yield acquired
+    finally:
+        # Закрытие дескриптора снимает блокировку
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """Записывает bytes во временный файл и атомарно подменяет им path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def state_dir():
+    """
+    Личный каталог файлов состояния (режим 0700): $XDG_RUNTIME_DIR/weather,
+    иначе $XDG_CACHE_HOME/weather или ~/.cache/weather.
+    В общем /tmp имена предсказуемы, и чужой пользователь мог бы заранее
+    создать файл или ссылку и подменить состояние.
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'weather')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        info = os.lstat(path)
+        if info.st_uid != os.getuid() or not stat.S_ISDIR(info.st_mode):
+            raise PermissionError(f"Каталог состояния принадлежит другому пользователю: {path}")
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
+
+
+def state_file(name):
+    """Файл состояния, общий для всех процессов пользователя: <state_dir>/<name>.state"""
+    return os.path.join(state_dir(), f'{name}.state')
+
+
+def open_state(path):
+    """Открывает файл состояния на чтение и запись, не следуя по символической ссылке"""
+    return os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT | O_NOFOLLOW, 0o600), 'r+b')
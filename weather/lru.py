@@ -0,0 +1,98 @@
+"""
+Ограниченный LRU-кэш в памяти процесса — первый уровень перед хранилищем.
+Хранит уже разобранные данные вместе со временем записи, поэтому повторное
+чтение ключа не трогает диск и не разбирает JSON.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 1024
+
+
+class _Entry:
+    __slots__ = ('timestamp', 'data', 'size')
+
+    def __init__(self, timestamp, data, size):
+        self.timestamp = timestamp
+        self.data = data
+        self.size = size
+
+
+class LRUCache:
+    """
+    LRU с ограничением по числу записей (capacity) и, при желании, по суммарному
+    размеру (max_bytes, размер записи передает вызывающий). Записи старше
+    max_age секунд считаются отсутствующими и удаляются при обращении.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_bytes=None, max_age=None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Возвращает (timestamp, data) или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.max_age is not None and time.time() - entry.timestamp >= self.max_age:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.timestamp, entry.data
+
+    def set(self, key, timestamp, data, size=0):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(timestamp, data, size)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.capacity
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Счетчики попаданий, промахов, вытеснений и истечений"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
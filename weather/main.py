@@ -2,23 +2,27 @@
 """
 Консольное приложение для получения текущей погоды
 Использует API open-meteo.com с кэшированием результатов
+
+    python -m weather.main city Москва
 """
 
-from parser import create_parser
-from commands import get_weather_command
+from .client import get_default_client
+from .commands import handle_command
+from .parser import create_parser
 
 def main():
     """Основная функция приложения"""
     parser = create_parser()
     args = parser.parse_args()
-    
+
     try:
-        result = get_weather_command(args)
-        print(result)
+        handle_command(args)
     except KeyboardInterrupt:
         print("\nПрограмма прервана пользователем")
     except Exception as e:
         print(f"Произошла непредвиденная ошибка: {e}")
+    finally:
+        get_default_client().close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
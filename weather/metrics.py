@@ -0,0 +1,183 @@
+"""
+Метрики горячего пути: длительности участков (span) и счетчики событий.
+Один реестр на процесс; сводка отдается как JSON (--stats) или в текстовом
+формате Prometheus (/metrics в режиме сервиса).
+
+    with metrics.span('format_weather_data'):
+        ...
+    metrics.inc('http_responses', status=200)
+
+Объекты на самом горячем пути (кэш) ведут свои счетчики сами, а реестр
+читает их только при выгрузке через register(name, collector).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+PREFIX = 'weather_'
+# Границы корзин гистограммы длительностей, секунды
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _Timer:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = bisect.bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.buckets[index] += 1
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Registry:
+    """Потокобезопасный набор счетчиков и таймеров"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._collectors = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels(labels) if labels else ())
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def _timer(self, name):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer()
+            return timer
+
+    def observe(self, name, seconds):
+        timer = self._timer(name)
+        with self._lock:
+            timer.observe(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Замеряет длительность блока, в том числе завершившегося исключением"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name=None):
+        """Декоратор: span вокруг каждого вызова функции"""
+        def decorator(func):
+            # Таймер ищется один раз, а не при каждом вызове
+            timer = self._timer(name or func.__name__)
+            lock = self._lock
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        timer.observe(elapsed)
+            return wrapper
+        return decorator
+
+    def register(self, name, collector):
+        """
+        collector() возвращает словарь {счетчик: значение}; счетчики выгружаются
+        как name_<счетчик>. Повторная регистрация под тем же именем заменяет прежнюю.
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._collectors.clear()
+            # Таймеры обнуляются на месте: на них ссылаются декорированные функции
+            for timer in self._timers.values():
+                timer.__init__()
+
+    def _collect(self):
+        with self._lock:
+            counters = dict(self._counters)
+            collectors = list(self._collectors.items())
+        for prefix, collector in collectors:
+            for name, value in collector().items():
+                counters[(f"{prefix}_{name}", ())] = value
+        return counters
+
+    def summary(self):
+        """Сводка для JSON: счетчики и статистика по участкам в миллисекундах"""
+        counters = {
+            name + _format_labels(labels): value
+            for (name, labels), value in sorted(self._collect().items())
+        }
+        with self._lock:
+            spans = {
+                name: {
+                    'count': timer.count,
+                    'total_ms': round(timer.total * 1000, 3),
+                    'mean_ms': round(timer.total * 1000 / timer.count, 3),
+                    'max_ms': round(timer.max * 1000, 3),
+                }
+                for name, timer in sorted(self._timers.items())
+                if timer.count
+            }
+        return {'counters': counters, 'spans': spans}
+
+    def prometheus(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self._collect().items()):
+            metric = f"{PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        with self._lock:
+            for name, timer in sorted(self._timers.items()):
+                metric = f"{PREFIX}{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS, timer.buckets):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {timer.count}')
+                lines.append(f"{metric}_sum {timer.total:.6f}")
+                lines.append(f"{metric}_count {timer.count}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+timed = REGISTRY.timed
+register = REGISTRY.register
+summary = REGISTRY.summary
+prometheus = REGISTRY.prometheus
@@ -1,30 +1,55 @@
 import argparse
 
+from .address import DEFAULT_HOST, DEFAULT_PORT
+from .batch import CHUNK_SIZE
+from .warming import WARM_RPM, WARM_TOP
+
+def positive_int(text):
+    """Тип аргумента: целое больше нуля"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("должно быть больше нуля")
+    return value
+
 def create_parser():
     """Создает парсер аргументов командной строки"""
     parser = argparse.ArgumentParser(
+        prog='python -m weather.main',
         description='Получение текущей погоды',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog='''
 Примеры использования:
-  python main.py --city "Москва"
-  python main.py --coords 55.7558 37.6173
-  python main.py -c "Лондон"
+  python -m weather.main city "Москва"
+  python -m weather.main coords 55.7558 37.6173
+  python -m weather.main batch locations.csv --concurrency 8
+  python -m weather.main serve 127.0.0.1:8080
+  python -m weather.main warm --once
         '''
     )
-    
-    group = parser.add_mutually_exclusive_group(required=True)
-    group.add_argument(
-        '--city', '-c',
-        type=str,
-        help='Название города (например: "Москва")'
-    )
-    group.add_argument(
-        '--coords', 
-        nargs=2,
-        type=float,
-        metavar=('LATITUDE', 'LONGITUDE'),
-        help='Координаты (например: 55.7558 37.6173)'
-    )
-    
-    return parser
\ No newline at end of file
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    city = commands.add_parser('city', help='Погода в городе')
+    city.add_argument('name', help='Название города (например: "Москва")')
+
+    coords = commands.add_parser('coords', help='Погода по координатам')
+    coords.add_argument('lat', type=float, metavar='LATITUDE')
+    coords.add_argument('lon', type=float, metavar='LONGITUDE')
+
+    batch = commands.add_parser('batch', help='Погода для списка точек из CSV/JSONL, вывод в JSONL')
+    batch.add_argument('file', help='Файл со списком городов или координат ("-" — stdin)')
+    batch.add_argument('--chunk-size', type=positive_int, default=CHUNK_SIZE,
+                       help=f'Сколько точек запрашивать за один запрос (по умолчанию: {CHUNK_SIZE})')
+    batch.add_argument('--concurrency', type=int, default=1,
+                       help='Сколько запросов выполнять параллельно (по умолчанию: 1)')
+
+    serve = commands.add_parser('serve', help='HTTP-сервис погоды')
+    serve.add_argument('address', nargs='?', default=f'{DEFAULT_HOST}:{DEFAULT_PORT}', metavar='[HOST:]PORT')
+
+    warm = commands.add_parser('warm', help='Прогрев популярных ключей кэша')
+    warm.add_argument('--top', type=int, default=WARM_TOP,
+                      help=f'Сколько самых популярных ключей прогревать (по умолчанию: {WARM_TOP})')
+    warm.add_argument('--rpm', type=float, default=WARM_RPM,
+                      help=f'Не больше стольких запросов в минуту (по умолчанию: {WARM_RPM})')
+    warm.add_argument('--once', action='store_true', help='Один проход и выход')
+
+    return parser
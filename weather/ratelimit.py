@@ -0,0 +1,142 @@
+"""
+Ограничение частоты запросов к open-meteo, общее для всех процессов.
+Корзина токенов (token bucket) хранится в маленьком файле под файловой
+блокировкой, поэтому одновременно запущенные main.py, сервис и прогреватель
+расходуют один бюджет.
+
+Две полосы приоритета:
+    interactive — запросы пользователя (одиночный CLI, GUI, сервис);
+    background  — пакетный режим и прогрев кэша.
+Фоновый запрос не берет последние reserve токенов и уступает, пока
+интерактивный запрос ждет своего токена, — интерактивные идут первыми.
+"""
+
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from . import locking, metrics
+from .locking import file_lock, open_state
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+DEFAULT_RATE = 5.0        # токенов в секунду
+DEFAULT_BURST = 10
+DEFAULT_RESERVE = 2       # токены, которые фоновая полоса не трогает
+MAX_SLEEP = 1.0           # ждем порциями, чтобы заметить освободившийся токен
+
+# токены, время последнего пополнения, до какого момента ждет интерактивный запрос
+STATE = struct.Struct('<ddd')
+
+_local = threading.local()
+
+
+def state_file():
+    """Файл состояния: общий для всех процессов пользователя (WEATHER_RATELIMIT_FILE переопределяет)"""
+    return os.environ.get('WEATHER_RATELIMIT_FILE') or locking.state_file('ratelimit')
+
+
+def current_lane():
+    """Полоса текущего потока: задается lane(), по умолчанию interactive"""
+    return getattr(_local, 'lane', INTERACTIVE)
+
+
+@contextmanager
+def lane(name):
+    """
+    Выполняет блок в полосе name (только в текущем потоке; в пул потоков
+    полосу переносит in_lane)
+    """
+    previous = getattr(_local, 'lane', None)
+    _local.lane = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _local.lane
+        else:
+            _local.lane = previous
+
+
+def in_lane(name, func, *args):
+    """Вызывает func(*args) в полосе name: обертка для задач пула потоков"""
+    with lane(name):
+        return func(*args)
+
+
+class RateLimiter:
+    """Корзина токенов в файле path, разделяемая процессами"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, reserve=DEFAULT_RESERVE, path=None):
+        if reserve >= burst:
+            raise ValueError("reserve должен быть меньше burst")
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.path = path or state_file()
+        # flock разделяет и потоки (у каждого свой дескриптор), но без fcntl
+        # файловая блокировка — no-op, поэтому потоки процесса ждут еще и здесь
+        self._lock = threading.Lock()
+
+    def acquire(self, lane_name=None):
+        """Ждет токен в полосе lane_name (по умолчанию — полосе потока); возвращает время ожидания"""
+        lane_name = lane_name or current_lane()
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire(lane_name)
+            if wait <= 0:
+                break
+            time.sleep(min(wait, MAX_SLEEP))
+        waited = time.monotonic() - started
+        metrics.observe(f"ratelimit_wait_{lane_name}", waited)
+        if waited > 0.001:
+            metrics.inc('ratelimit_delayed', lane=lane_name)
+        return waited
+
+    def _try_acquire(self, lane_name):
+        """Берет токен и возвращает 0 или возвращает, сколько ждать до следующей попытки"""
+        with self._lock, file_lock(self.path):
+            with open_state(self.path) as f:
+                raw = f.read(STATE.size)
+                now = time.time()
+                if len(raw) == STATE.size:
+                    tokens, updated, interactive_until = self._sane(STATE.unpack(raw), now)
+                    tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                else:
+                    tokens, interactive_until = float(self.burst), 0.0
+
+                if lane_name == INTERACTIVE:
+                    need, blocked_for = 1.0, 0.0
+                else:
+                    need, blocked_for = 1.0 + self.reserve, interactive_until - now
+
+                if tokens >= need and blocked_for <= 0:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = max((need - tokens) / self.rate, blocked_for)
+                    if lane_name == INTERACTIVE:
+                        # Фоновые запросы не заберут токен, который мы ждем
+                        interactive_until = max(interactive_until, now + wait)
+
+                f.seek(0)
+                f.write(STATE.pack(tokens, now, interactive_until))
+        return wait
+
+    def _sane(self, state, now):
+        """
+        Состояние из файла с отброшенными невозможными значениями: время из
+        будущего (переведенные часы, испорченный файл) не должно задерживать
+        запросы дольше, чем ожидание одного токена
+        """
+        tokens, updated, interactive_until = state
+        if not 0 <= tokens <= self.burst:
+            tokens = float(self.burst)
+        if not 0 <= updated <= now:
+            updated = now
+        if not interactive_until <= now + (1 + self.reserve) / self.rate:
+            interactive_until = 0.0
+        return tokens, updated, interactive_until
@@ -0,0 +1,171 @@
+"""
+HTTP-сервис погоды: долгоживущий процесс, в котором кэш (с уровнем в памяти),
+индекс городов и пул HTTP-соединений остаются теплыми между запросами.
+
+    GET  /weather?city=Москва
+    GET  /weather?lat=55.7558&lon=37.6173
+    POST /weather/batch[?concurrency=N]  — тело CSV/JSONL как в пакетном режиме, ответ JSONL
+                                          (N от 1, больше POOL_MAXSIZE не берется)
+    GET  /health
+    GET  /metrics — метрики в текстовом формате Prometheus
+
+Ответ на /weather — {"query": ..., "source": "cache|stale|api|expired", "data": ...},
+где data — текущая погода open-meteo (utc_offset_seconds и current_weather) в одной
+схеме для всех source (см. codec.normalize_current).
+Пока API недоступен и в кэше нет данных точки, ответ — 503 с Retry-After.
+"""
+
+import io
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import metrics
+from .address import DEFAULT_HOST, DEFAULT_PORT
+from .batch import describe, read_locations, run_batch
+from .breaker import CircuitOpenError
+from .session import POOL_MAXSIZE
+
+MAX_BODY = 10 * 1024 * 1024
+ROUTES = frozenset({'/weather', '/weather/batch', '/health', '/metrics'})
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class WeatherService:
+    """Поиск погоды поверх WeatherClient (источник, индекс городов и кэш)"""
+
+    def __init__(self, client, chunk_size=None):
+        self.client = client
+        self.chunk_size = chunk_size
+
+    def lookup(self, location):
+        """Запись ответа для одной точки"""
+        data, source = self.client.lookup(location)
+        return {'query': describe(location), 'source': source, 'data': data}
+
+    def batch(self, text, concurrency=1):
+        """Пакетный запрос: JSONL-строки в том же формате, что и у --batch"""
+        try:
+            locations = read_locations(io.StringIO(text))
+        except ValueError as e:
+            raise BadRequest(str(e))
+        out = io.StringIO()
+        options = {'chunk_size': self.chunk_size} if self.chunk_size else {}
+        run_batch(locations, self.client, self.client.cache, self.client.location_key, out,
+                  concurrency=concurrency, **options)
+        return out.getvalue()
+
+
+def parse_location(query):
+    """Точка из параметров запроса ?city= или ?lat=&lon="""
+    params = parse_qs(query)
+    if 'city' in params:
+        city = params['city'][0].strip()
+        if not city:
+            raise BadRequest("Пустое название города")
+        return 'city', city
+    try:
+        return 'coords', float(params['lat'][0]), float(params['lon'][0])
+    except (KeyError, ValueError):
+        raise BadRequest("Укажите city или lat и lon")
+
+
+class WeatherRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят отдельными записями: без TCP_NODELAY keep-alive
+    # соединение ждет отложенного ACK (~40 мс) на каждый ответ
+    disable_nagle_algorithm = True
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif url.path == '/metrics':
+            self._send(200, 'text/plain; version=0.0.4; charset=utf-8', metrics.prometheus().encode('utf-8'))
+        elif url.path == '/weather':
+            self._handle(lambda: self._send_json(200, self.service.lookup(parse_location(url.query))))
+        else:
+            self._send_json(404, {'error': 'Не найдено'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/weather/batch':
+            self._send_json(404, {'error': 'Не найдено'})
+            return
+        self._handle(lambda: self._send(200, 'application/x-ndjson', self._batch(url.query)))
+
+    def _batch(self, query):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            raise BadRequest("Некорректный Content-Length")
+        if length < 0:
+            # rfile.read(-1) ждал бы, пока клиент закроет соединение
+            raise BadRequest("Некорректный Content-Length")
+        if length > MAX_BODY:
+            raise BadRequest("Слишком большой запрос")
+        try:
+            concurrency = int(parse_qs(query).get('concurrency', ['1'])[0])
+        except ValueError:
+            raise BadRequest("concurrency должно быть числом")
+        if concurrency < 1:
+            raise BadRequest("concurrency должно быть не меньше 1")
+        # Один клиент не создает потоков больше, чем соединений в пуле
+        concurrency = min(concurrency, POOL_MAXSIZE)
+        text = self.rfile.read(length).decode('utf-8')
+        return self.service.batch(text, concurrency).encode('utf-8')
+
+    def _handle(self, action):
+        with metrics.span('server_request'):
+            try:
+                action()
+            except BadRequest as e:
+                # Тело запроса могло остаться непрочитанным: соединение не переиспользуем
+                self._send_json(400, {'error': str(e)}, headers={'Connection': 'close'})
+            except CircuitOpenError as e:
+                self._send_json(503, {'error': str(e)},
+                                headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))})
+            except ValueError as e:
+                # Геокодер не нашел город
+                self._send_json(404, {'error': str(e)})
+            except Exception as e:
+                self._send_json(502, {'error': f"Ошибка API: {e}"})
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, 'application/json; charset=utf-8',
+                   json.dumps(payload, ensure_ascii=False).encode('utf-8'), headers)
+
+    def _send(self, status, content_type, body, headers=None):
+        path = urlsplit(self.path).path
+        # Неизвестные пути не становятся отдельными рядами метрик
+        metrics.inc('server_responses', path=path if path in ROUTES else 'other', status=status)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Создает многопоточный HTTP-сервер для service"""
+    handler = type('Handler', (WeatherRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Запускает сервис до Ctrl+C"""
+    server = make_server(service, host, port)
+    print(f"Сервис погоды слушает http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nСервис остановлен")
+    finally:
+        server.server_close()
@@ -0,0 +1,178 @@
+"""
+Общая HTTP-сессия для запросов к open-meteo.
+Пул соединений с keep-alive, ограничение соединений на хост
+и ограниченные повторы с экспоненциальной задержкой и джиттером
+на 429/5xx и сетевых ошибках (с учетом заголовка Retry-After).
+Каждая попытка берет токен у общего для процессов ограничителя (см. ratelimit),
+а после серии сбоев хоста запросы к нему сразу завершаются ошибкой (см. breaker).
+requests импортируется при создании первого клиента, поэтому запуск,
+которому хватает кэша, не загружает HTTP-стек.
+"""
+
+import random
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+from . import metrics
+from .breaker import CircuitBreaker
+from .locking import state_file
+from .ratelimit import RateLimiter
+
+DEFAULT_TIMEOUT = 5
+POOL_CONNECTIONS = 4     # сколько хостов держать в пуле
+POOL_MAXSIZE = 10        # сколько соединений держать на один хост
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5       # секунд, удваивается с каждой попыткой
+BACKOFF_MAX = 10.0
+RETRY_AFTER_MAX = 30.0   # дольше этого Retry-After не ждем, а сразу отдаем ошибку
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class HTTPClient:
+    """Обертка над requests.Session с пулом соединений и повторами"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, limiter=None, breakers=True):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        # Выключатель на каждый хост: сбой геокодера не отключает прогнозы
+        self._breakers = {} if breakers else None
+        self._breakers_lock = threading.Lock()
+        self._network_errors = (requests.ConnectionError, requests.Timeout)
+
+        self.session = requests.Session()
+        # pool_block: при исчерпании пула ждем свободное соединение, а не открываем лишние
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get_json(self, url, params=None, timeout=None):
+        """
+        GET-запрос с повторами; возвращает разобранный JSON.
+        Если хост недавно не отвечал, сразу бросает breaker.CircuitOpenError
+        """
+        breaker = self._breaker(url)
+        if breaker is None:
+            return self._get_json(url, params, timeout or self.timeout)
+        breaker.before_call()
+        try:
+            data = self._get_json(url, params, timeout or self.timeout)
+        except Exception as e:
+            if self._is_outage(e):
+                breaker.record_failure()
+            else:
+                # Сервер ответил (например, 404): он доступен
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return data
+
+    def _breaker(self, url):
+        if self._breakers is None:
+            return None
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                path = state_file(f"breaker-{zlib.crc32(host.encode('utf-8')):08x}")
+                breaker = self._breakers[host] = CircuitBreaker(host, path=path)
+            return breaker
+
+    def _is_outage(self, error):
+        """Сбой хоста, а не ошибка запроса: сеть, таймаут, 429 и 5xx после всех повторов"""
+        if isinstance(error, self._network_errors):
+            return True
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code in RETRY_STATUSES
+
+    def _get_json(self, url, params, timeout):
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except self._network_errors as e:
+                metrics.inc('http_errors', kind=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                metrics.inc('http_retries', reason='network')
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            metrics.inc('http_responses', status=response.status_code)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if delay <= RETRY_AFTER_MAX:
+                    metrics.inc('http_retries', reason=response.status_code)
+                    response.close()
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+            response.raise_for_status()
+            return response.json()
+
+    def _backoff(self, attempt):
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        """Задержка из заголовка Retry-After (секунды или HTTP-дата) или None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Возвращает общий для процесса HTTP-клиент (с ограничителем частоты по умолчанию)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient(limiter=RateLimiter())
+        return _client
+
+
+def configure(**options):
+    """
+    Пересоздает общий HTTP-клиент с новыми настройками пула и повторов;
+    limiter=None отключает ограничение частоты
+    """
+    global _client
+    options.setdefault('limiter', RateLimiter())
+    options.setdefault('breakers', True)
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HTTPClient(**options)
+        return _client
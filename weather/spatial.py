@@ -0,0 +1,135 @@
+"""
+Пространственные ключи кэша: координаты квантуются в ячейки geohash,
+поэтому близкие точки (и 55.7558 / 55.75580) попадают в одну запись.
+Сетка моделей open-meteo — километры, так что точность в ячейку не теряется.
+
+Размер ячейки по точности geohash:
+    5 — 4.9 x 4.9 км, 6 — 1.2 x 0.6 км, 7 — 153 x 153 м
+"""
+
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE = {ch: i for i, ch in enumerate(BASE32)}
+
+KEY_PREFIX = 'geo_'
+DEFAULT_PRECISION = 6
+# Насколько далеко (по центрам ячеек) можно взять данные соседней ячейки
+DEFAULT_RADIUS_KM = 2.0
+
+
+def encode(lat, lon, precision=DEFAULT_PRECISION):
+    """Geohash точки заданной длины"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits, lon_lo = bits * 2 + 1, mid
+            else:
+                bits, lon_hi = bits * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits, lat_lo = bits * 2 + 1, mid
+            else:
+                bits, lat_hi = bits * 2, mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    """Границы ячейки: (lat_min, lat_max, lon_min, lon_max)"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for ch in geohash:
+        value = DECODE[ch]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def center(geohash):
+    """Координаты центра ячейки"""
+    lat_lo, lat_hi, lon_lo, lon_hi = bounds(geohash)
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def neighbors(geohash):
+    """Восемь соседних ячеек той же точности"""
+    lat_lo, lat_hi, lon_lo, lon_hi = bounds(geohash)
+    lat, lon = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+    result = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx == dy == 0:
+                continue
+            n_lat = lat + dy * (lat_hi - lat_lo)
+            if not -90 < n_lat < 90:
+                continue
+            n_lon = (lon + dx * (lon_hi - lon_lo) + 180) % 360 - 180
+            result.append(encode(n_lat, n_lon, len(geohash)))
+    return result
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Расстояние по дуге большого круга"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+class SpatialGrid:
+    """Ключи кэша по ячейкам geohash и поиск ближайших ячеек"""
+
+    def __init__(self, precision=DEFAULT_PRECISION, radius_km=DEFAULT_RADIUS_KM):
+        if not 1 <= precision <= 12:
+            raise ValueError("Точность geohash должна быть от 1 до 12")
+        self.precision = precision
+        self.radius_km = radius_km
+
+    def key(self, lat, lon):
+        """Ключ кэша для ячейки, в которую попадает точка"""
+        return KEY_PREFIX + encode(lat, lon, self.precision)
+
+    @staticmethod
+    def is_cell_key(key):
+        return key.startswith(KEY_PREFIX)
+
+    @staticmethod
+    def center(key):
+        """Центр ячейки по ключу кэша"""
+        return center(key[len(KEY_PREFIX):])
+
+    def nearby(self, key):
+        """Ключи соседних ячеек в пределах radius_km, ближайшие первыми"""
+        if self.radius_km <= 0:
+            return []
+        geohash = key[len(KEY_PREFIX):]
+        lat, lon = center(geohash)
+        found = []
+        for neighbor in neighbors(geohash):
+            n_lat, n_lon = center(neighbor)
+            distance = distance_km(lat, lon, n_lat, n_lon)
+            if distance <= self.radius_km:
+                found.append((distance, KEY_PREFIX + neighbor))
+        found.sort()
+        return [key for _, key in found]
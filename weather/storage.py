@@ -0,0 +1,255 @@
+"""
+Хранилища для кэша погоды.
+Хранилище знает только про ключ, время записи и сериализованные данные;
+TTL и формат данных определяет WeatherCache. Кроме записей оно хранит
+популярность ключей (число обращений с экспоненциальным затуханием),
+по которой прогреватель выбирает, что обновлять заранее.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from .locking import file_lock
+
+# За это время счет обращений к ключу затухает вдвое
+ACCESS_HALF_LIFE = 24 * 3600
+# Счетчики ключей, к которым так долго не обращались, удаляются
+ACCESS_RETENTION = 7 * 24 * 3600
+
+
+def decay(updated, now):
+    """Множитель затухания счета, обновленного в updated, к моменту now"""
+    return 0.5 ** (max(0.0, now - updated) / ACCESS_HALF_LIFE)
+
+
+class Storage:
+    """Базовый интерфейс хранилища кэша"""
+
+    def get(self, key):
+        """Возвращает пару (timestamp, value) или None"""
+        raise NotImplementedError
+
+    def set(self, key, timestamp, value):
+        """Записывает значение с временем записи (epoch-секунды)"""
+        raise NotImplementedError
+
+    def set_many(self, items):
+        """Записывает пачку (key, timestamp, value)"""
+        for key, timestamp, value in items:
+            self.set(key, timestamp, value)
+
+    def delete(self, key):
+        """Удаляет запись по ключу"""
+        raise NotImplementedError
+
+    def purge_expired(self, older_than, limit=100):
+        """Удаляет не более limit записей старше older_than, возвращает их число"""
+        raise NotImplementedError
+
+    def record_access(self, counts, now):
+        """Добавляет обращения {key: число} к счету популярности ключей"""
+
+    def forget_access(self, keys):
+        """Удаляет счета популярности ключей"""
+
+    def hot_keys(self, limit, now):
+        """До limit самых популярных ключей: [(key, счет, время записи или None)]"""
+        return []
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Освобождает ресурсы хранилища"""
+
+
+class MemoryStorage(Storage):
+    """Хранилище в памяти процесса (для тестов и коротких запусков)"""
+
+    def __init__(self):
+        self._data = {}
+        self._access = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, timestamp, value):
+        self._data[key] = (timestamp, value)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def purge_expired(self, older_than, limit=100):
+        expired = [k for k, (ts, _) in self._data.items() if ts < older_than][:limit]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def record_access(self, counts, now):
+        for key, count in counts.items():
+            score, updated = self._access.get(key, (0.0, now))
+            self._access[key] = (score * decay(updated, now) + count, now)
+
+    def forget_access(self, keys):
+        for key in keys:
+            self._access.pop(key, None)
+
+    def hot_keys(self, limit, now):
+        scored = sorted(((score * decay(updated, now), key)
+                         for key, (score, updated) in self._access.items()), reverse=True)
+        return [(key, score, self._data[key][0] if key in self._data else None)
+                for score, key in scored[:limit]]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStorage(Storage):
+    """
+    Хранилище в SQLite: поиск по первичному ключу и индекс по времени записи.
+    Файл можно разделять между процессами: в режиме WAL каждая запись — атомарная
+    транзакция, читатели не ждут писателя и видят согласованный снимок,
+    а конкурирующие писатели ждут блокировку до busy_timeout секунд.
+    Внутри процесса соединение разделяется между потоками под блокировкой.
+    """
+
+    def __init__(self, path='weather_cache.db', busy_timeout=30):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.create_function('decay', 2, decay, deterministic=True)
+        # Переход в WAL и создание таблиц в новом файле не ждут busy_timeout:
+        # одновременно запущенные процессы готовят файл по очереди
+        with file_lock(path + '.lock'):
+            self._init_schema()
+
+    def _init_schema(self):
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                data BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_timestamp ON cache (timestamp);
+            CREATE TABLE IF NOT EXISTS access (
+                key TEXT PRIMARY KEY,
+                score REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS access_updated ON access (updated);
+            """
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT timestamp, data FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, key, timestamp, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, timestamp, data) VALUES (?, ?, ?)',
+                (key, timestamp, value)
+            )
+
+    def set_many(self, items):
+        """Записывает пачку (key, timestamp, value) одной транзакцией"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, timestamp, data) VALUES (?, ?, ?)',
+                items
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def purge_expired(self, older_than, limit=100):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache WHERE timestamp < ? ORDER BY timestamp LIMIT ?)',
+                (older_than, limit)
+            )
+        return cursor.rowcount
+
+    def record_access(self, counts, now):
+        """Обновляет счета одной транзакцией; затухание считается при записи"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO access (key, score, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'score = score * decay(updated, excluded.updated) + excluded.score, '
+                'updated = excluded.updated',
+                [(key, count, now) for key, count in counts.items()]
+            )
+            self._conn.execute('DELETE FROM access WHERE updated < ?', (now - ACCESS_RETENTION,))
+
+    def forget_access(self, keys):
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM access WHERE key = ?', [(key,) for key in keys])
+
+    def hot_keys(self, limit, now):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT access.key, access.score * decay(access.updated, ?) AS current, cache.timestamp '
+                'FROM access LEFT JOIN cache ON cache.key = access.key '
+                'ORDER BY current DESC LIMIT ?',
+                (now, limit)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json(json_file, storage):
+    """
+    Однократно переносит записи из старого weather_cache.json в хранилище.
+    После переноса файл переименовывается в *.migrated, чтобы не читать его повторно.
+    Миграция выполняется под файловой блокировкой, поэтому из нескольких
+    одновременно запущенных процессов ее выполнит только один.
+    Возвращает число перенесенных записей.
+    """
+    with file_lock(json_file + '.lock'):
+        if not os.path.exists(json_file):
+            # Другой процесс уже перенес кэш
+            return 0
+        return _migrate_json_locked(json_file, storage)
+
+
+def _migrate_json_locked(json_file, storage):
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            legacy = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Ошибка чтения старого кэша: {e}", file=sys.stderr)
+        return 0
+
+    items = []
+    for key, value in legacy.items():
+        try:
+            timestamp = datetime.fromisoformat(value['timestamp']).timestamp()
+            data = json.dumps(value['data'], ensure_ascii=False, separators=(',', ':'))
+        except (KeyError, TypeError, ValueError):
+            continue
+        items.append((key, timestamp, data))
+
+    storage.set_many(items)
+
+    os.replace(json_file, json_file + '.migrated')
+    return len(items)
@@ -0,0 +1,131 @@
+"""
+Прогрев кэша: популярные ключи обновляются незадолго до истечения TTL,
+чтобы первый пользователь после истечения не ждал API.
+
+Популярность — счет обращений к ключу с затуханием (см. storage). Прогреватель
+берет top самых популярных ключей, выбирает те, что истекают в ближайшие
+lead секунд (или уже отсутствуют, но не помечены как ненайденные), и обновляет
+их пачками по chunk_size точек одним запросом к API, не чаще rpm запросов в минуту. Запросы прогрева идут
+в фоновой полосе ограничителя частоты и уступают интерактивным.
+"""
+
+import sys
+import threading
+import time
+
+from . import metrics
+from .batch import CHUNK_SIZE
+from .ratelimit import BACKGROUND, lane
+
+WARM_TOP = 100
+WARM_RPM = 30
+WARM_LEAD = 10 * 60       # секунд до истечения TTL, когда ключ пора обновлять
+IDLE_INTERVAL = 60        # как часто проверять ключи, если обновлять нечего
+
+
+class Warmer:
+    """
+    Обновляет популярные ключи cache через api (get_coords_by_city и
+    get_weather_by_coords_many, как в пакетном режиме).
+    locate(key) возвращает точку ('city', name) или ('coords', lat, lon);
+    по умолчанию — cache.key_location.
+    """
+
+    def __init__(self, cache, api, locate=None, top=WARM_TOP, rpm=WARM_RPM,
+                 lead=WARM_LEAD, chunk_size=CHUNK_SIZE):
+        self.cache = cache
+        self.api = api
+        self.locate = locate or cache.key_location
+        self.top = top
+        self.interval = 60.0 / rpm
+        self.lead = lead
+        self.chunk_size = chunk_size
+        self._next_request = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, now=None):
+        """Популярные ключи, которые истекают в ближайшие lead секунд, — самые срочные первыми"""
+        now = time.time() if now is None else now
+        ttl = self.cache.ttl.total_seconds()
+        due = []
+        for key, _, timestamp in self.cache.hot_keys(self.top):
+            # Отсутствующая запись популярного ключа тоже прогревается,
+            # если только это не недавно ненайденный город
+            if timestamp is None and self.cache.get_missing(key) is not None:
+                continue
+            expires = (timestamp or 0.0) + ttl
+            if expires - now <= self.lead:
+                due.append((expires, key))
+        due.sort()
+        return [key for _, key in due]
+
+    def run_once(self):
+        """Один проход: обновляет все ключи, которые пора обновить, с учетом бюджета"""
+        stats = {'refreshed': 0, 'requests': 0, 'errors': 0}
+        keys = self.due()
+        with lane(BACKGROUND):
+            for start in range(0, len(keys), self.chunk_size):
+                if not self._wait_turn():
+                    break
+                self._refresh(keys[start:start + self.chunk_size], stats)
+        return stats
+
+    def run(self):
+        """Обновляет ключи до вызова stop()"""
+        while not self._stop.is_set():
+            stats = self.run_once()
+            if not stats['requests']:
+                self._stop.wait(min(IDLE_INTERVAL, self.lead / 2))
+
+    def start(self):
+        """Запускает прогрев в фоновом потоке"""
+        self._thread = threading.Thread(target=self.run, name='cache-warmer', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _wait_turn(self):
+        """Ждет очередного слота бюджета запросов; False, если прогрев остановлен"""
+        delay = self._next_request - time.monotonic()
+        if delay > 0 and self._stop.wait(delay):
+            return False
+        self._next_request = time.monotonic() + self.interval
+        return not self._stop.is_set()
+
+    def _refresh(self, keys, stats):
+        pending = {}  # (lat, lon) -> [key, ...]
+        for key in keys:
+            location = self.locate(key)
+            try:
+                if location[0] == 'city':
+                    coords = tuple(self.api.get_coords_by_city(location[1]))
+                else:
+                    coords = tuple(location[1:])
+            except Exception as e:
+                print(f"Прогрев {key}: {e}", file=sys.stderr)
+                stats['errors'] += 1
+                continue
+            pending.setdefault(coords, []).append(key)
+        if not pending:
+            return
+
+        chunk = list(pending)
+        stats['requests'] += 1
+        metrics.inc('warm_requests')
+        try:
+            results = self.api.get_weather_by_coords_many(chunk)
+        except Exception as e:
+            print(f"Ошибка прогрева кэша: {e}", file=sys.stderr)
+            # Ключи, не прошедшие геокодинг, уже посчитаны выше
+            stats['errors'] += sum(len(sent) for sent in pending.values())
+            metrics.inc('warm_errors')
+            return
+        fresh = [(key, data) for coords, data in zip(chunk, results) for key in pending[coords]]
+        self.cache.set_many(fresh)
+        stats['refreshed'] += len(fresh)
+        metrics.inc('warm_refreshed', len(fresh))
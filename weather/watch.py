@@ -0,0 +1,151 @@
+"""
+Режим наблюдения: один процесс следит за набором точек и выводит только
+изменения. Города геокодируются один раз; точки, для которых open-meteo
+еще не мог выпустить новые данные (время current_weather плюс интервал
+обновления не наступило), не запрашиваются; остальные запрашиваются
+пачками, и наружу (и в кэш) попадают только записи с новым полем time.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from . import metrics
+from .batch import CHUNK_SIZE, describe
+
+WATCH_INTERVAL = 60       # секунд между проверками
+UPDATE_INTERVAL = 15 * 60  # как часто open-meteo обновляет current_weather, если ответ не сообщает
+
+
+def next_update(data):
+    """Когда (epoch) у точки могут появиться новые данные; 0 — неизвестно, проверять сразу"""
+    current = data.get('current_weather', {})
+    try:
+        local = datetime.fromisoformat(current['time']).replace(tzinfo=timezone.utc)
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    started = local.timestamp() - data.get('utc_offset_seconds', 0)
+    return started + current.get('interval', UPDATE_INTERVAL)
+
+
+def jsonl_emitter(out):
+    """Выводит изменения записями JSONL в формате пакетного режима"""
+    def emit(location, source=None, data=None, error=None):
+        record = {'query': describe(location)}
+        if error is not None:
+            record['error'] = str(error)
+        else:
+            record.update(source=source, data=data)
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+    return emit
+
+
+class Watcher:
+    """
+    Следит за точками locations через api (get_coords_by_city и
+    get_weather_by_coords_many). emit(location, source, data) получает
+    каждое изменение, emit(location, error=...) — ошибки.
+    cache — WeatherCache или None, key_func строит ключ кэша для точки.
+    """
+
+    def __init__(self, locations, api, cache, key_func, emit,
+                 interval=WATCH_INTERVAL, chunk_size=CHUNK_SIZE):
+        self.api = api
+        self.cache = cache
+        self.emit = emit
+        self.interval = interval
+        self.chunk_size = chunk_size
+        # Точки с одинаковым ключом загружаются один раз
+        self._groups = {}
+        for location in locations:
+            self._groups.setdefault(key_func(location), []).append(location)
+        self._coords = {}   # key -> (lat, lon)
+        self._time = {}     # key -> time последней выведенной записи
+        self._next = {}     # key -> когда могут появиться новые данные
+        self._stop = threading.Event()
+
+    def poll(self, now=None):
+        """Одна проверка: выводит изменившиеся точки и возвращает их число"""
+        now = time.time() if now is None else now
+        if not self._time and self.cache is not None:
+            changed = self._serve_cached()
+        else:
+            changed = 0
+        due = [key for key in self._groups if self._next.get(key, 0.0) <= now]
+        pending = {}  # (lat, lon) -> [key, ...]
+        for key in due:
+            coords = self._locate(key)
+            if coords is not None:
+                pending.setdefault(coords, []).append(key)
+
+        all_coords = list(pending)
+        for start in range(0, len(all_coords), self.chunk_size):
+            chunk = all_coords[start:start + self.chunk_size]
+            try:
+                results = self.api.get_weather_by_coords_many(chunk)
+            except Exception as e:
+                for coords in chunk:
+                    self._emit_error(pending[coords], e)
+                continue
+            fresh = []
+            for coords, data in zip(chunk, results):
+                for key in pending[coords]:
+                    if self._update(key, data, 'api'):
+                        fresh.append((key, data))
+            if fresh and self.cache is not None:
+                self.cache.set_many(fresh)
+            changed += len(fresh)
+        metrics.inc('watch_updates', changed)
+        return changed
+
+    def run(self):
+        """Проверяет точки каждые interval секунд до вызова stop()"""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._stop.set()
+
+    def _serve_cached(self):
+        """Первая проверка: сразу выводит то, что уже есть в кэше"""
+        changed = 0
+        for key in self._groups:
+            data = self.cache.get(key)
+            if data is not None and self._update(key, data, 'cache'):
+                changed += 1
+        return changed
+
+    def _locate(self, key):
+        if key not in self._coords:
+            location = self._groups[key][0]
+            try:
+                if location[0] == 'city':
+                    self._coords[key] = tuple(self.api.get_coords_by_city(location[1]))
+                else:
+                    self._coords[key] = tuple(location[1:])
+            except Exception as e:
+                # Повторим на следующей проверке
+                self._emit_error([key], e)
+                return None
+        return self._coords[key]
+
+    def _update(self, key, data, source):
+        """Запоминает данные точки; True и вывод, если время current_weather изменилось"""
+        self._next[key] = next_update(data)
+        current_time = data.get('current_weather', {}).get('time')
+        if key in self._time and self._time[key] == current_time:
+            return False
+        self._time[key] = current_time
+        for location in self._groups[key]:
+            self.emit(location, source, data)
+        return True
+
+    def _emit_error(self, keys, error):
+        metrics.inc('watch_errors')
+        for key in keys:
+            for location in self._groups[key]:
+                self.emit(location, error=error)